@@ -1,22 +1,26 @@
 # Description:
 # Created by Emilia on 2026-01-31
-
-import pathlib
-
-from google import genai
-from google.genai import types
-from google.genai.types import HttpOptions, Part
+import json
+import os
 
 from dotenv import load_dotenv
-import os
-from google import genai
 
+from ai import keyword_cache
+from ai.gemini_client import generate_content, stream_content
 from entities.ai_data import AiInfo
-from use_case.convert_time import convert_unix_time
+from use_case.encode_history import encode_journals, encode_quizzes
+from use_case.quiz_trends import compute_quiz_trends, encode_trends
 from use_case.retrieve_quizzes_journals import retrieve_all_quizzes_and_journals
+from use_case.select_history_context import select_history, DEFAULT_TOKEN_BUDGET
 
+# the only fields the prompt tables use (each collection ignores the names that aren't its own)
+PROMPT_FIELDS = ["title", "content", "date", "quiz", "yesterday_goal", "tomorrow"]
+# the full check-in history goes in as a trend summary; only this many of the newest check-ins as raw rows
+RECENT_QUIZ_ROWS = int(os.getenv("AI_RECENT_QUIZ_ROWS", "7"))
 
-async def get_response(data: AiInfo):
+
+async def build_prompt(data: AiInfo):
+    """Build the mentor prompt for this request. Returns (prompt, history_stats)."""
     load_dotenv()
     message = data.content
     prompt = f"""You are a supportive guidance counselor and learning mentor for a girl or young woman in early high school.
@@ -52,12 +56,23 @@ Avoid:
 
 Here is the message she sent you: {message}
 """
-    journals, quizzes = await retrieve_all_quizzes_and_journals(data.user_ID)
+    journals, quizzes = await retrieve_all_quizzes_and_journals(data.user_ID, PROMPT_FIELDS)
 
-    for i in range(len(journals)):
-        journals[i] = convert_unix_time(journals[i])
-    for i in range(len(quizzes)):
-        quizzes[i] = convert_unix_time(quizzes[i])
+    trends = encode_trends(compute_quiz_trends(quizzes)) if data.read_quizzes else ""
+    quizzes_summarized = len(quizzes) if data.read_quizzes else 0
+
+    # only spend the token budget on history the user actually shared
+    journals, quizzes, history_stats = select_history(
+        message,
+        journals if data.read_journal else [],
+        quizzes[:RECENT_QUIZ_ROWS] if data.read_quizzes else [],
+        DEFAULT_TOKEN_BUDGET if data.token_budget is None else data.token_budget,
+    )
+
+    history_stats["quizzes_summarized"] = quizzes_summarized
+
+    journals = encode_journals(journals)
+    quizzes = encode_quizzes(quizzes)
 
     if data.read_journal and data.read_quizzes:
         prompt += f""" \n
@@ -69,17 +84,21 @@ Focus on trends, not individual mistakes.
     How to use the following data:
 - Journal entries represent her personal reflections and emotions about learning.
 - Quiz/check-in data represents self-reported numerical ratings (confidence, motivation, difficulty, etc.).
+- The trend table summarizes all of her check-ins: slope_per_week is how fast a rating is rising (+) or falling (-), volatility is how much it jumps between check-ins.
 - Use this data to identify patterns, trends, or recurring challenges.
 - Focus on changes over time, repeated themes, and emotional or confidence-related patterns.
 - Use this information only to tailor your guidance, not to judge or evaluate her performance.
 
 Below is structured background data about her past experiences
-This data is provided in JSON-like format for clarity.
+This data is provided as compact tables: a header line naming the columns, then one row per entry (newest first).
 
 JOURNAL ENTRIES (free-text reflections):
 {journals}
 
-QUIZ / CHECK-IN DATA (numerical self-reports):
+QUIZ / CHECK-IN TRENDS (computed from every check-in):
+{trends}
+
+MOST RECENT CHECK-INS (numerical self-reports):
 {quizzes}
         """
 
@@ -92,11 +111,15 @@ QUIZ / CHECK-IN DATA (numerical self-reports):
         
          How to use the following data:
 - Quiz/check-in data represents self-reported numerical ratings (confidence, motivation, difficulty, etc.).
+- The trend table summarizes all of her check-ins: slope_per_week is how fast a rating is rising (+) or falling (-), volatility is how much it jumps between check-ins.
 - Use this data to identify patterns, trends, or recurring challenges.
 - Focus on changes over time, repeated themes, and emotional or confidence-related patterns.
 - Use this information only to tailor your guidance, not to judge or evaluate her performance.
 
-QUIZ / CHECK-IN DATA (numerical self-reports):
+QUIZ / CHECK-IN TRENDS (computed from every check-in):
+{trends}
+
+MOST RECENT CHECK-INS (numerical self-reports):
 {quizzes}
                 """
 
@@ -124,24 +147,38 @@ Base your response only on what she shares in the current message.
 Avoid making assumptions about her history or progress.
                 """
 
+    return prompt, history_stats
 
-    client = genai.Client(api_key=os.environ["GOOGLE_API_KEY2"])
 
+async def get_response(data: AiInfo):
+    prompt, history_stats = await build_prompt(data)
+    response_text = await generate_content(prompt)
+    print(response_text)
+    return {"response": response_text, "history": history_stats}
 
-    response = client.models.generate_content(
-      model="gemini-3-flash-preview",
-      contents=[
-          prompt
-      ]
-    )
-    print(response.text)
-    return response.text
 
+async def stream_response(data: AiInfo):
+    """
+    Streaming version of get_response.
+
+    Yields ("history", history_stats) once the prompt is built, then ("text", chunk)
+    for every piece of the reply as the model generates it.
+    """
+    prompt, history_stats = await build_prompt(data)
+    yield "history", history_stats
+    async for chunk in stream_content(prompt):
+        yield "text", chunk
 
 
 
 
-def ai_keywords(journal: str):
+
+async def ai_keywords(journal: str):
+    # same entry already extracted (re-save, retry, backfill) -> skip the model call
+    cached = await keyword_cache.get(journal)
+    if cached is not None:
+        return cached
+
     prompt = f"""
 You are an information extraction assistant.
 
@@ -182,14 +219,44 @@ Output: slow progress
 Now process this journal entry:
 {journal}"""
 
-    client = genai.Client(api_key=os.environ["GOOGLE_API_KEY2"])
+    response_text = await generate_content(prompt)
+    print(response_text)
+    await keyword_cache.put(journal, response_text)
+    return response_text
 
 
-    response = client.models.generate_content(
-      model="gemini-3-flash-preview",
-      contents=[
-          prompt
-      ]
-    )
-    print(response.text)
-    return response.text
+async def analyze_text_for_topics(journal: str) -> dict:
+    """
+    Extract the learning topics (stars) in a journal entry and the constellation each belongs to.
+
+    Returns:
+        {"topics": [{"name": str, "constellation": str, "confidence": int}, ...]}
+    """
+    prompt = f"""
+You are an information extraction assistant.
+
+Task:
+Given ONE journal entry about learning / school / confidence, list the specific learning topics it talks about.
+
+Rules (must follow):
+- Output ONLY a JSON object of the form:
+  {{"topics": [{{"name": "...", "constellation": "...", "confidence": 1-5}}]}}
+- "name": the specific topic, lowercase, MAX 3 words (e.g. "fractions", "quadratic equations", "python loops").
+- "constellation": the broad subject it belongs to, Title Case (e.g. "Mathematics", "Programming", "Physics", "Study Skills").
+  Use "General" if nothing fits.
+- "confidence": how sure you are of the constellation, 1 (guess) to 5 (certain).
+- At most 5 topics. Return {{"topics": []}} if the entry has no learning topic.
+- Avoid names, dates, and emotions as topics.
+
+Now process this journal entry:
+{journal}"""
+
+    response_text = await generate_content(prompt, json_output=True)
+    try:
+        result = json.loads(response_text)
+    except (TypeError, ValueError):
+        print(f"Could not parse topics from model reply: {response_text}")
+        return {"topics": []}
+    if not isinstance(result, dict) or not isinstance(result.get("topics"), list):
+        return {"topics": []}
+    return result
@@ -0,0 +1,127 @@
+# Description: one shared async Gemini client per process.
+# pooled http connections, a cap on in-flight model calls, and retry with backoff on transient errors.
+# Created on 2026-10-18
+import asyncio
+import os
+from typing import Optional
+
+import httpx
+from dotenv import load_dotenv
+from google import genai
+from google.genai import errors
+from google.genai.types import GenerateContentConfig, HttpOptions
+from tenacity import AsyncRetrying, retry_if_exception, stop_after_attempt, wait_exponential_jitter
+
+load_dotenv()
+
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-3-flash-preview")
+# max model calls running at once across all requests in this worker
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "8"))
+GEMINI_MAX_CONNECTIONS = int(os.getenv("GEMINI_MAX_CONNECTIONS", "20"))
+GEMINI_TIMEOUT_MS = int(os.getenv("GEMINI_TIMEOUT_MS", "60000"))
+GEMINI_RETRY_ATTEMPTS = int(os.getenv("GEMINI_RETRY_ATTEMPTS", "4"))
+
+# rate limited / overloaded - worth another try
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+_client: Optional[genai.Client] = None
+_semaphore: Optional[asyncio.Semaphore] = None
+
+
+def _get_client() -> genai.Client:
+    """Build the client on first use so importing this module never needs the API key."""
+    global _client
+    if _client is None:
+        _client = genai.Client(
+            api_key=os.environ["GOOGLE_API_KEY2"],
+            http_options=HttpOptions(
+                timeout=GEMINI_TIMEOUT_MS,
+                async_client_args={
+                    "limits": httpx.Limits(
+                        max_connections=GEMINI_MAX_CONNECTIONS,
+                        max_keepalive_connections=GEMINI_MAX_CONNECTIONS,
+                    ),
+                },
+            ),
+        )
+    return _client
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(GEMINI_MAX_CONCURRENCY)
+    return _semaphore
+
+
+def _is_retryable(exc: BaseException) -> bool:
+    if isinstance(exc, errors.APIError):
+        return exc.code in RETRYABLE_STATUS_CODES
+    return isinstance(exc, httpx.TransportError)
+
+
+def _retrying() -> AsyncRetrying:
+    return AsyncRetrying(
+        retry=retry_if_exception(_is_retryable),
+        stop=stop_after_attempt(GEMINI_RETRY_ATTEMPTS),
+        wait=wait_exponential_jitter(initial=0.5, max=8),
+        reraise=True,
+    )
+
+
+async def generate_content(prompt: str, json_output: bool = False) -> str:
+    """
+    Send one prompt to Gemini without blocking the event loop.
+
+    Waits for a free concurrency slot, then retries transient failures
+    (429 / 5xx / network) with exponential backoff.
+
+    Args:
+        prompt: The full prompt text
+        json_output: Ask the model to reply with a JSON document only
+
+    Returns:
+        The model's reply text
+    """
+    async with _get_semaphore():
+        async for attempt in _retrying():
+            with attempt:
+                response = await _get_client().aio.models.generate_content(
+                    model=GEMINI_MODEL,
+                    contents=[prompt],
+                    config=GenerateContentConfig(response_mime_type="application/json") if json_output else None,
+                )
+    return response.text
+
+
+async def stream_content(prompt: str):
+    """
+    Send one prompt to Gemini and yield the reply text piece by piece as it is generated.
+
+    Holds a concurrency slot for the whole stream. Only opening the stream is retried;
+    once text has been sent to the caller a failure is raised instead of restarting the reply.
+
+    Args:
+        prompt: The full prompt text
+
+    Yields:
+        Chunks of the model's reply text
+    """
+    async with _get_semaphore():
+        async for attempt in _retrying():
+            with attempt:
+                stream = await _get_client().aio.models.generate_content_stream(
+                    model=GEMINI_MODEL,
+                    contents=[prompt],
+                )
+        async for chunk in stream:
+            if chunk.text:
+                yield chunk.text
+
+
+async def close_client():
+    """Release pooled connections (call on server shutdown)."""
+    global _client
+    if _client is not None:
+        await _client.aio.aclose()
+        _client = None
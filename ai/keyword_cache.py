@@ -0,0 +1,59 @@
+# Description: two-tier cache for ai_keywords results.
+# in-process LRU in front of a mongo collection with a TTL, keyed by a hash of the normalized text.
+# Created on 2026-10-18
+import hashlib
+import os
+import re
+from typing import Optional
+
+from db.keyword_cache_crud import get_cached_keywords, save_cached_keywords
+from db.lru_cache import LRUCache
+
+KEYWORD_CACHE_MAX_ITEMS = int(os.getenv("KEYWORD_CACHE_MAX_ITEMS", "10000"))
+KEYWORD_CACHE_MAX_BYTES = int(os.getenv("KEYWORD_CACHE_MAX_BYTES", str(4 * 1024 * 1024)))
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+_memory = LRUCache(KEYWORD_CACHE_MAX_ITEMS, KEYWORD_CACHE_MAX_BYTES, sizeof=len)
+_db_hits = 0
+_db_misses = 0
+
+
+def content_hash(text: str) -> str:
+    """Hash of the text with case and whitespace differences removed, so re-saves of the same entry match."""
+    normalized = _WHITESPACE_RE.sub(" ", text).strip().lower()
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+async def get(text: str) -> Optional[str]:
+    """Look up a previous extraction: memory first, then mongo (promoting hits into memory)."""
+    global _db_hits, _db_misses
+    key = content_hash(text)
+    result = _memory.get(key)
+    if result is not None:
+        return result
+
+    result = await get_cached_keywords(key)
+    if result is None:
+        _db_misses += 1
+        return None
+    _db_hits += 1
+    _memory.set(key, result)
+    return result
+
+
+async def put(text: str, result: Optional[str]):
+    """Remember an extraction. Empty results (a blocked or empty model reply gives None) are not cached."""
+    if not result:
+        return
+    key = content_hash(text)
+    _memory.set(key, result)
+    await save_cached_keywords(key, result)
+
+
+def stats() -> dict:
+    """Hit/miss counters for both tiers."""
+    return {
+        "memory": _memory.stats(),
+        "db": {"hits": _db_hits, "misses": _db_misses},
+    }
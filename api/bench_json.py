@@ -0,0 +1,129 @@
+# Description: benchmark - encode time and bytes on the wire for a 5,000-entry /get_all history,
+# old path (serialize_* per document + jsonable_encoder + json.dumps) vs api/fast_json.py (orjson + compression),
+# then eager dict decoding vs the raw BSON read mode (/get_all?stream=true) for cpu time and peak memory.
+# pure cpu, no database needed:   python -m api.bench_json
+# Created on 2026-10-18
+import asyncio
+import json
+import random
+import statistics
+import time
+import tracemalloc
+
+import bson
+from bson import ObjectId
+from bson.raw_bson import RawBSONDocument
+from fastapi.encoders import jsonable_encoder
+
+from api.fast_json import brotli, compress, dumps, stream_json_object
+
+ENTRIES = 5000
+RUNS = 15
+WORDS = "today i worked on fractions and felt more confident about the homework than last week".split()
+
+
+def make_history(entries: int = ENTRIES) -> dict:
+    """Half journals, half quiz check-ins, shaped like the stored documents."""
+    random.seed(7)
+    journals = [{"_id": ObjectId(), "user_ID": "697e72befc3d7a3d1a8d3d1a", "title": f"day {i}",
+                 "content": " ".join(random.choices(WORDS, k=120)), "date": 1706668800 + i * 86400,
+                 "star_IDs": [str(ObjectId()) for _ in range(3)], "keyphrase": "concept click"}
+                for i in range(entries // 2)]
+    quizzes = [{"_id": ObjectId(), "user_ID": "697e72befc3d7a3d1a8d3d1a",
+                "quiz": {"confidence": random.randint(1, 10), "motivation": random.randint(1, 10),
+                         "difficulty": random.randint(1, 10)},
+                "yesterday_goal": random.randint(0, 1), "tomorrow": "finish the lab", "date": 1706668800 + i * 86400}
+               for i in range(entries - entries // 2)]
+    return {"journals": journals, "quizzes": quizzes}
+
+
+def old_path(history: dict) -> bytes:
+    # what the crud list reads + FastAPI's default JSONResponse did
+    content = {kind: [dict(doc, _id=str(doc["_id"])) for doc in docs] for kind, docs in history.items()}
+    return json.dumps(jsonable_encoder(content), ensure_ascii=False, allow_nan=False, indent=None,
+                      separators=(",", ":")).encode("utf-8")
+
+
+def fast_path(history: dict) -> bytes:
+    return dumps(history)
+
+
+def timed(fn, *args) -> tuple:
+    samples, result = [], None
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        result = fn(*args)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), result
+
+
+def bench_json():
+    history = make_history()
+    print(f"{ENTRIES} entries, median of {RUNS} runs:")
+
+    old_ms, old_body = timed(old_path, history)
+    fast_ms, fast_body = timed(fast_path, history)
+    print(f"{'encode: serialize + jsonable_encoder + json':<46} {old_ms:8.1f} ms   {len(old_body) / 1024:8.0f} KiB")
+    print(f"{'encode: orjson':<46} {fast_ms:8.1f} ms   {len(fast_body) / 1024:8.0f} KiB"
+          f"   ({old_ms / fast_ms:.1f}x faster)")
+
+    for encoding in (["gzip"] + (["br"] if brotli is not None else [])):
+        ms, body = timed(compress, fast_body, encoding)
+        print(f"{'compress: ' + encoding:<46} {ms:8.1f} ms   {len(body) / 1024:8.0f} KiB"
+              f"   ({len(fast_body) / len(body):.1f}x smaller)")
+
+
+async def _raw_cursor(wire: list):
+    # what the driver yields in raw read mode: the bytes it received, wrapped
+    for data in wire:
+        yield RawBSONDocument(data)
+
+
+async def _dict_cursor(wire: list):
+    # what the driver yields by default: every document decoded to a dict
+    for data in wire:
+        yield bson.decode(data)
+
+
+def eager_read(wire: dict) -> int:
+    # default read mode as get_user_journals does it: build the whole list, then encode it in one go
+    async def run():
+        content = {kind: [doc async for doc in _dict_cursor(docs)] for kind, docs in wire.items()}
+        return len(dumps(content))
+    return asyncio.run(run())
+
+
+def raw_read(wire: dict) -> int:
+    async def run():
+        sent = 0
+        async for chunk in stream_json_object({kind: _raw_cursor(docs) for kind, docs in wire.items()}):
+            sent += len(chunk)
+        return sent
+    return asyncio.run(run())
+
+
+def measure(fn, *args) -> tuple:
+    """(median ms, peak bytes allocated while running) - peak measured on a separate untimed run."""
+    ms, _ = timed(fn, *args)
+    tracemalloc.start()
+    fn(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return ms, peak
+
+
+def bench_raw_reads():
+    # the documents as they come off the wire
+    wire = {kind: [bson.encode(doc) for doc in docs] for kind, docs in make_history().items()}
+    print(f"\nread + encode {ENTRIES} entries from BSON (excluding the {sum(map(len, sum(wire.values(), []))) / 1024:.0f}"
+          f" KiB received):")
+    eager_ms, eager_peak = measure(eager_read, wire)
+    raw_ms, raw_peak = measure(raw_read, wire)
+    print(f"{'eager: decode to dicts, then encode':<46} {eager_ms:8.1f} ms   peak {eager_peak / 1024:8.0f} KiB")
+    print(f"{'raw: RawBSONDocument, streamed':<46} {raw_ms:8.1f} ms   peak {raw_peak / 1024:8.0f} KiB"
+          f"   ({eager_peak / raw_peak:.0f}x less memory)")
+
+
+if __name__ == "__main__":
+    bench_json()
+    bench_raw_reads()
@@ -0,0 +1,214 @@
+# Description: fast response path for large payloads.
+# orjson encoding (ObjectId is converted inside the encoder, so list reads can skip the serialize_* pass over
+# every document), streaming of raw BSON cursors, and gzip / brotli compression negotiated from
+# Accept-Encoding above a size threshold.
+# Created on 2026-10-18
+import gzip
+import os
+import zlib
+from typing import Any, AsyncIterable, AsyncIterator, Dict, Optional
+
+import anyio
+import bson
+import orjson
+from bson import ObjectId
+from bson.raw_bson import RawBSONDocument
+from dotenv import load_dotenv
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import JSONResponse
+
+try:
+    import brotli
+except ImportError:  # optional: without it responses are only gzip-compressed
+    brotli = None
+
+load_dotenv()
+
+# smaller bodies aren't worth the cpu (and often fit in one packet anyway)
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "5"))
+BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+# bodies at least this big are compressed in a worker thread so the event loop keeps serving other requests
+COMPRESSION_THREAD_BYTES = int(os.getenv("COMPRESSION_THREAD_BYTES", str(256 * 1024)))
+
+# streamed responses are sent in chunks of about this size
+STREAM_CHUNK_BYTES = int(os.getenv("STREAM_CHUNK_BYTES", str(64 * 1024)))
+
+COMPRESSIBLE_TYPES = ("application/json", "text/plain", "text/html")
+
+
+def _default(obj: Any):
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, RawBSONDocument):
+        # decoded here, one document at a time, straight into the output
+        return bson.decode(obj.raw)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """JSON-encode with orjson; ObjectIds become their hex string."""
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse rendered by orjson. Return it directly from an endpoint to also skip FastAPI's
+    jsonable_encoder pass (which can't handle ObjectId anyway).
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+async def stream_json_object(members: Dict[str, AsyncIterable]) -> AsyncIterator[bytes]:
+    """
+    Encode {"name": [doc, ...], ...} from async iterables (e.g. raw cursors) without ever holding
+    the whole list: each document is encoded as it arrives and output goes out in ~STREAM_CHUNK_BYTES chunks.
+    """
+    buffer = bytearray(b"{")
+    for i, (name, docs) in enumerate(members.items()):
+        if i:
+            buffer += b","
+        buffer += dumps(name) + b":["
+        first = True
+        async for doc in docs:
+            if not first:
+                buffer += b","
+            first = False
+            buffer += dumps(doc)
+            if len(buffer) >= STREAM_CHUNK_BYTES:
+                yield bytes(buffer)
+                buffer.clear()
+        buffer += b"]"
+    buffer += b"}"
+    yield bytes(buffer)
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Best encoding we support from an Accept-Encoding header ("br" over "gzip"), None for identity."""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            accepted[name.strip().lower()] = q
+
+    candidates = (["br"] if brotli is not None else []) + ["gzip"]
+    best = max(candidates, key=lambda e: accepted.get(e, accepted.get("*", 0.0)))
+    return best if accepted.get(best, accepted.get("*", 0.0)) > 0 else None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+def _mark_encoded(headers: MutableHeaders, encoding: str):
+    headers["Content-Encoding"] = encoding
+    # the bytes differ from the identity representation, so the ETag can only be weak (as nginx does)
+    etag = headers.get("etag")
+    if etag and not etag.startswith("W/"):
+        headers["ETag"] = f"W/{etag}"
+
+
+class StreamCompressor:
+    """Incremental gzip / brotli for responses sent in several body messages."""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.process(data)
+        return self._compressor.compress(data)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing JSON / text responses.
+
+    Complete (single-message) responses are compressed in one go if at least `minimum_size`;
+    streamed JSON (stream_json_object) is compressed chunk by chunk. SSE isn't a compressible
+    type, so events still reach the client as they are generated.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        passthrough = False
+        streaming: Optional[StreamCompressor] = None
+
+        async def send_compressed(message):
+            nonlocal start_message, passthrough, streaming
+            if message["type"] == "http.response.start":
+                # hold the headers until we have seen the body
+                start_message = message
+                return
+            if streaming is not None and message["type"] == "http.response.body":
+                more_body = message.get("more_body", False)
+                body = streaming.compress(message.get("body", b""))
+                if not more_body:
+                    body += streaming.finish()
+                await send({"type": "http.response.body", "body": body, "more_body": more_body})
+                return
+            if passthrough or start_message is None or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            start, start_message = start_message, None
+            headers = MutableHeaders(raw=start["headers"])
+            body = message.get("body", b"")
+            compressible = ("content-encoding" not in headers
+                            and headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES))
+            if compressible:
+                headers.add_vary_header("Accept-Encoding")
+            if compressible and message.get("more_body", False):
+                streaming = StreamCompressor(encoding)
+                _mark_encoded(headers, encoding)
+                del headers["Content-Length"]
+                await send(start)
+                await send({"type": "http.response.body", "body": streaming.compress(body), "more_body": True})
+                return
+            if not compressible or len(body) < self.minimum_size:
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+
+            if len(body) >= COMPRESSION_THREAD_BYTES:
+                body = await anyio.to_thread.run_sync(compress, body, encoding)
+            else:
+                body = compress(body, encoding)
+            _mark_encoded(headers, encoding)
+            headers["Content-Length"] = str(len(body))
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_compressed)
@@ -1,25 +1,74 @@
 # Description: main file running on digitalocean web server
 # Created by Emilia on 2026-01-31
-from fastapi import FastAPI, HTTPException
+import hashlib
+from typing import List, Optional
 
+from fastapi import Body, FastAPI, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 
-from db.setup_indexes import create_indexes
-from db.user_crud import create_user, get_or_create_user
+from api.fast_json import CompressionMiddleware, FastJSONResponse, stream_json_object
+from ai import keyword_cache
+from ai.gemini_client import close_client
+
+from db import command_monitor, history_cache
+from db.database import causal_reads, log_client_settings, read_session
+from db.loaders import request_scope
+from db.pagination import DEFAULT_PAGE_SIZE
+from db.index_migrations import ensure_indexes
+from db.journal_crud import get_journal_owner
+from db.quiz_crud import get_quiz_entry_owner
+from db.user_versions import get_version, validity_window
+from db.user_crud import get_or_create_user_id, user_id_cache_stats
 from use_case.retrieve_quiz import retrieve_quiz_by_id
-from use_case.retrieve_quizzes_journals import retrieve_all_quizzes_and_journals
-from use_case.save_journal import save_journal
-from use_case.save_quiz import save_quiz
-from use_case.prompt_ai import prompt_ai
+from use_case.retrieve_journal_list import retrieve_journal_page
+from use_case.retrieve_quiz_list import retrieve_quiz_page
+from use_case.retrieve_quiz_rollups import retrieve_quiz_rollups
+from use_case.retrieve_quizzes_journals import retrieve_all_quizzes_and_journals, stream_all_quizzes_and_journals
+from use_case.analyze_and_link_stars import get_constellation_map
+from use_case.quiz_trends import TREND_POINTS, TREND_WINDOW, get_quiz_trends
+from use_case.job_workers import start_workers, stop_workers
+from use_case.save_journal import save_journal, save_journals
+from use_case.save_quiz import save_quiz, save_quizzes
+from use_case.prompt_ai import prompt_ai, stream_prompt_ai
 from use_case.prompt_ai import convert_ai
-from use_case.retrieve_journal import retrieve_journal_by_id
+from use_case.retrieve_journal import retrieve_journal_by_id, retrieve_journals_by_ids
+
+class LoaderScopeMiddleware:
+    """
+    Each request gets its own batching/dedup loaders for by-ID lookups (db/loaders.py).
+    Plain ASGI: it only sets a contextvar, so no extra task or body wrapper per request.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        with request_scope():
+            await self.app(scope, receive, send)
+
 
-app = FastAPI()
+app = FastAPI(default_response_class=FastJSONResponse)
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(LoaderScopeMiddleware)
+
+MAX_BATCH_IDS = 500
 
 @app.on_event("startup")
 async def startup_event():
     """Run on server start"""
-    await create_indexes()
-    print("✓ Database indexes initialized")
+    log_client_settings()
+    await ensure_indexes()
+    start_workers()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Run on server stop"""
+    await stop_workers()
+    await close_client()
 
 @app.post("/save_questionnaire")
 async def receive(data: dict):
@@ -37,38 +86,224 @@ async def receive(data: dict):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/save_questionnaires")
+async def receive(data: List[dict] = Body(...)):
+    try:
+        results = await save_quizzes(data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return batch_response(results)
+
+@app.post("/save_journal_entries")
+async def receive(data: List[dict] = Body(...)):
+    try:
+        results = await save_journals(data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return batch_response(results)
+
+def batch_response(results: list) -> dict:
+    saved = sum(1 for r in results if r["status"] == "success")
+    return {"response": "success", "saved": saved, "failed": len(results) - saved, "results": results}
+
 @app.post("/ai_request")
 async def receive(data: dict):
-    newData = convert_ai(data)
+    try:
+        newData = convert_ai(data)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
     try:
         return await prompt_ai(newData)
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/ai_request_stream")
+async def receive(data: dict):
+    try:
+        newData = convert_ai(data)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return StreamingResponse(
+        stream_prompt_ai(newData),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# ETags: "<what>:<user_ID>:<user's data version>.<validity window>" (db/user_versions.py), so checking
+# If-None-Match only needs the version lookup, never the query behind the response. The window turns an
+# ETag over every DATA_VERSION_MAX_AGE_SECONDS, so a missed version bump can't keep a client on stale data.
+def make_etag(key: str, user_ID: str, version: int) -> str:
+    return f'"{key}:{user_ID}:{version}.{validity_window(user_ID)}"'
+
+
+def _if_none_match(request: Request) -> List[str]:
+    header = request.headers.get("if-none-match") or ""
+    return [tag.strip().removeprefix("W/") for tag in header.split(",") if tag.strip()]
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    tags = _if_none_match(request)
+    return etag in tags or "*" in tags
+
+
+def etag_user(request: Request, key: str) -> Optional[str]:
+    """The user_ID inside an If-None-Match ETag we issued for `key`, if the client sent one."""
+    for tag in _if_none_match(request):
+        parts = tag.strip('"').rsplit(":", 2)
+        if len(parts) == 3 and parts[0] == key:
+            return parts[1]
+    return None
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
+
+
+async def conditional_get(request: Request, response: Response, kind: str, entity_id: str, get_owner, fetch):
+    """
+    GET one entity with ETag support. The owner comes from the client's ETag when it has one,
+    otherwise from a tiny _id lookup; either way the version is read before the entity, so
+    the ETag never claims a newer version than the data it is sent with.
+    """
+    key = f"{kind}:{entity_id}"
+    owner = etag_user(request, key) or await get_owner(entity_id)
+    if owner is None:
+        return await fetch(entity_id)
+
+    etag = make_etag(key, owner, await get_version(owner))
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    result = await fetch(entity_id)
+    if result is not None and result.get("user_ID") == owner:
+        response.headers["ETag"] = etag
+    return result
+
+
 @app.get("/get_quiz")
-async def receive(quiz_id: str):
+async def receive(quiz_id: str, request: Request, response: Response):
     try:
-        result = await retrieve_quiz_by_id(quiz_id)
-        return result
+        return await conditional_get(request, response, "quiz", quiz_id, get_quiz_entry_owner, retrieve_quiz_by_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/get_journal")
-async def receive(journal_id: str):
+async def receive(journal_id: str, request: Request, response: Response):
     try:
-        result = await retrieve_journal_by_id(journal_id)
-        return result
+        return await conditional_get(request, response, "journal", journal_id, get_journal_owner,
+                                     retrieve_journal_by_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def parse_fields(fields: Optional[str]):
+    """"title,date,preview" -> ["title", "date", "preview"]; None/empty means every field."""
+    if not fields:
+        return None
+    return [f.strip() for f in fields.split(",") if f.strip()]
+
+
+@app.get("/get_journals")
+async def receive(journal_ids: str):
+    """journal_ids is comma separated; results keep that order and skip ids that don't exist"""
+    ids = [i.strip() for i in journal_ids.split(",") if i.strip()]
+    if len(ids) > MAX_BATCH_IDS:
+        raise HTTPException(status_code=400, detail=f"too many ids (max {MAX_BATCH_IDS})")
+    try:
+        return {"journals": await retrieve_journals_by_ids(ids)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+async def stream_all(user_ID: str, fields: Optional[List[str]], after):
+    """/get_all?stream=true body. Runs after the handler returned, so it continues the handler's causal session."""
+    async with causal_reads(after=after):
+        async for chunk in stream_json_object(stream_all_quizzes_and_journals(user_ID, fields)):
+            yield chunk
+
+
 @app.get("/get_all")
+async def receive(user_ID: str, request: Request, fields: Optional[str] = None, stream: bool = False):
+    try:
+        fields = parse_fields(fields)
+        # each field selection is its own representation, so it gets its own ETag
+        selection = hashlib.sha1(",".join(sorted(set(fields))).encode()).hexdigest()[:12] if fields else "all"
+        # version and data in one causal session, so a secondary can't serve data older than the ETag says
+        async with causal_reads():
+            version = await get_version(user_ID)
+            etag = make_etag(f"all.{selection}", user_ID, version)
+            if etag_matches(request, etag):
+                return not_modified(etag)
+
+            if stream:
+                # raw BSON straight from the cursors to the client; an error part way through can only cut the body short
+                return StreamingResponse(stream_all(user_ID, fields, read_session()),
+                                         media_type="application/json", headers={"ETag": etag})
+
+            journals, quizzes = await retrieve_all_quizzes_and_journals(user_ID, fields, version)
+        # returned directly: the documents still hold ObjectIds, which only the fast encoder handles
+        return FastJSONResponse({"journals": journals, "quizzes": quizzes}, headers={"ETag": etag})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/journals")
+async def receive(user_ID: str, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None,
+                  date_from: Optional[int] = Query(None, alias="from"),
+                  date_to: Optional[int] = Query(None, alias="to"),
+                  fields: Optional[str] = None):
+    try:
+        return await retrieve_journal_page(user_ID, limit, cursor, date_from, date_to, parse_fields(fields))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/quizzes")
+async def receive(user_ID: str, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None,
+                  date_from: Optional[int] = Query(None, alias="from"),
+                  date_to: Optional[int] = Query(None, alias="to"),
+                  fields: Optional[str] = None):
+    try:
+        return await retrieve_quiz_page(user_ID, limit, cursor, date_from, date_to, parse_fields(fields))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/quiz_trends")
+async def receive(user_ID: str, window: int = Query(TREND_WINDOW, ge=1, le=365),
+                  points: int = Query(TREND_POINTS, ge=3, le=1000)):
+    try:
+        return await get_quiz_trends(user_ID, window, points)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/quiz_rollups")
+async def receive(user_ID: str, period: str = "week",
+                  date_from: Optional[int] = Query(None, alias="from"),
+                  date_to: Optional[int] = Query(None, alias="to")):
+    try:
+        return await retrieve_quiz_rollups(user_ID, period, date_from, date_to)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/constellation_map")
 async def receive(user_ID: str):
     try:
-        journals, quizzes = await retrieve_all_quizzes_and_journals(user_ID)
-        return {"journals": journals, "quizzes": quizzes}
+        return await get_constellation_map(user_ID)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -76,8 +311,18 @@ async def receive(user_ID: str):
 @app.post("/login")
 async def login(body: dict):
     try:
-        usr_dict = await get_or_create_user(body)
-        user_id = usr_dict["_id"]
+        user_id = await get_or_create_user_id(body)
         return {"user_id": user_id}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/db_stats")
+async def db_stats(collection: Optional[str] = None):
+    """Mongo command latency histograms, reply sizes and recent slow commands (db/command_monitor.py)"""
+    return command_monitor.stats(collection)
+
+
+@app.get("/cache_stats")
+async def cache_stats():
+    return {"keywords": keyword_cache.stats(), "history": history_cache.stats(), "logins": user_id_cache_stats()}
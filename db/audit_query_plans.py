@@ -0,0 +1,215 @@
+# Description: query-plan audit - runs every query shape used in db/*_crud.py through explain()
+# against a scratch database on a local mongod (built with the real INDEX_SPECS) and fails on
+# collection scans or in-memory sorts, so index drift is caught before it reaches Atlas.
+#
+#   python -m db.audit_query_plans                      (mongodb://localhost:27017)
+#   AUDIT_MONGODB_URI=mongodb://host:port python -m db.audit_query_plans
+#
+# When you add or change a query in a crud module, add / update its shape in query_shapes().
+# Created on 2026-10-18
+import asyncio
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+
+# the db package connects lazily, so it only needs a database name to import
+os.environ.setdefault("MONGODB_DB", "plan_audit")
+
+from db.pagination import build_page_filter, encode_cursor  # noqa: E402
+from db.setup_indexes import create_indexes  # noqa: E402
+
+AUDIT_MONGODB_URI = os.getenv("AUDIT_MONGODB_URI", "mongodb://localhost:27017")
+
+USERS = [f"user{i}" for i in range(5)]
+NOW = datetime.now(timezone.utc)
+
+
+def seed_documents() -> dict:
+    """A small but realistic data set so the planner has real choices to make."""
+    constellations = [{"_id": ObjectId(), "name": name} for name in ("Mathematics", "Programming", "Physics")]
+    stars, journals, quizzes = [], [], []
+    for user in USERS:
+        user_stars = []
+        for c in constellations:
+            for n in range(3):
+                star = {"_id": ObjectId(), "user_ID": user, "name": f"{c['name'].lower()} {n}",
+                        "constellation_ID": str(c["_id"]), "journal_IDs": []}
+                user_stars.append(star)
+        for d in range(40):
+            journal = {"_id": ObjectId(), "user_ID": user, "title": f"day {d}", "content": "x" * 200,
+                       "date": 1706668800 + d * 86400, "star_IDs": []}
+            star = user_stars[d % len(user_stars)]
+            journal["star_IDs"].append(str(star["_id"]))
+            star["journal_IDs"].append(str(journal["_id"]))
+            journals.append(journal)
+            quizzes.append({"_id": ObjectId(), "user_ID": user, "quiz": {"confidence": d % 10},
+                            "yesterday_goal": d % 2, "tomorrow": "study", "date": 1706668800 + d * 86400})
+        stars.extend(user_stars)
+
+    return {
+        "users": [{"_id": ObjectId(), "email": f"{u}@example.com", "name": u} for u in USERS],
+        "journals": journals,
+        "stars": stars,
+        "constellations": constellations,
+        "quiz": quizzes,
+        "quiz_rollups": [{"_id": f"{u}:week:{1706486400 + w * 604800}", "user_ID": u, "period": "week",
+                          "start": 1706486400 + w * 604800, "count": 7} for u in USERS for w in range(6)],
+        "user_versions": [{"_id": u, "version": 3} for u in USERS],
+        "keyword_cache": [{"_id": f"hash{i}", "result": "test anxiety", "created_at": NOW} for i in range(20)],
+        "jobs": [{"_id": ObjectId(), "type": "journal_stars", "payload": {}, "status": status, "attempts": 0,
+                  "max_attempts": 5, "run_at": NOW - timedelta(minutes=i), "created_at": NOW}
+                 for i, status in enumerate(["pending", "leased", "done", "dead"] * 10)],
+    }
+
+
+def query_shapes(docs: dict) -> list:
+    """(name, explain command) for every query shape the crud modules issue."""
+    user = USERS[0]
+    journal = docs["journals"][0]
+    star = docs["stars"][0]
+    constellation = docs["constellations"][0]
+    journal_ids = [j["_id"] for j in docs["journals"][:5]]
+    star_ids = [s["_id"] for s in docs["stars"][:5]]
+    page_cursor = encode_cursor(docs["journals"][20])
+    newest_first = {"date": -1, "_id": -1}
+
+    def find(collection, query, sort=None, limit=None):
+        cmd = {"find": collection, "filter": query}
+        if sort:
+            cmd["sort"] = sort
+        if limit:
+            cmd["limit"] = limit
+        return cmd
+
+    return [
+        # user_crud
+        ("user_crud: user by email", find("users", {"email": f"{user}@example.com"})),
+        ("user_crud: login upsert", {"findAndModify": "users", "query": {"email": f"{user}@example.com"},
+                                     "update": {"$setOnInsert": {"name": user}}, "upsert": True}),
+        ("user_crud: user by id", find("users", {"_id": docs["users"][0]["_id"]})),
+        # journal_crud
+        ("journal_crud: journal by id", find("journals", {"_id": journal["_id"]})),
+        ("journal_crud: journals by ids", find("journals", {"_id": {"$in": journal_ids}})),
+        ("journal_crud: get_journals_by_star", find("journals", {"star_IDs": journal["star_IDs"][0]})),
+        ("journal_crud: get_user_journals", find("journals", {"user_ID": user}, {"date": -1})),
+        ("journal_crud: journals first page", find("journals", build_page_filter(user), newest_first, 21)),
+        ("journal_crud: journals next page", find("journals", build_page_filter(user, page_cursor), newest_first, 21)),
+        ("journal_crud: journals date range", find("journals", build_page_filter(user, None, 1706668800, 1707668800),
+                                                   newest_first, 21)),
+        # quiz_crud
+        ("quiz_crud: quiz by id", find("quiz", {"_id": docs["quiz"][0]["_id"]})),
+        ("quiz_crud: get_user_quiz_entries", find("quiz", {"user_ID": user}, {"date": -1})),
+        ("quiz_crud: quiz next page", find("quiz", build_page_filter(user, page_cursor), newest_first, 21)),
+        # quiz_rollup_crud
+        ("quiz_rollup_crud: get_quiz_rollups", find("quiz_rollups", {"user_ID": user, "period": "week",
+                                                                     "start": {"$gte": 1706668800}}, {"start": 1})),
+        ("quiz_rollup_crud: recompute extremes", {"aggregate": "quiz", "cursor": {}, "pipeline": [
+            {"$match": {"user_ID": user, "date": {"$gte": 1706659200, "$lt": 1706745600}}},
+            {"$group": {"_id": None, "confidence__min": {"$min": {
+                "$cond": [{"$isNumber": "$quiz.confidence"}, "$quiz.confidence", None]}}}}]}),
+        ("quiz_rollup_crud: rebuild", find("quiz", {"user_ID": user})),
+        # star_crud
+        ("star_crud: star by id", find("stars", {"_id": star["_id"]})),
+        ("star_crud: stars by ids", find("stars", {"_id": {"$in": star_ids}})),
+        ("star_crud: get_star_by_name", find("stars", {"user_ID": user, "name": star["name"]})),
+        ("star_crud: stars by names", find("stars", {"user_ID": user, "name": {"$in": [star["name"], "x"]}})),
+        ("star_crud: get_stars_by_constellation", find("stars", {"user_ID": user,
+                                                                 "constellation_ID": star["constellation_ID"]})),
+        ("star_crud: get_all_user_stars", find("stars", {"user_ID": user})),
+        ("star_crud: delete_star unlink journals", {"update": "journals", "updates": [
+            {"q": {"star_IDs": str(star["_id"])}, "u": {"$pull": {"star_IDs": str(star["_id"])}}, "multi": True}]}),
+        # constellation_crud
+        ("constellation_crud: by name", find("constellations", {"name": constellation["name"]})),
+        ("constellation_crud: by names", find("constellations", {"name": {"$in": ["Mathematics", "Art"]}})),
+        ("constellation_crud: all sorted", find("constellations", {}, {"name": 1})),
+        ("constellation_crud: map $lookup side", find("stars", {"constellation_ID": str(constellation["_id"]),
+                                                                "user_ID": user})),
+        ("constellation_crud: delete_constellation count", {"count": "stars", "query": {
+            "constellation_ID": str(constellation["_id"])}}),
+        # user_versions
+        ("user_versions: get_version", find("user_versions", {"_id": user})),
+        # keyword_cache_crud
+        ("keyword_cache_crud: by hash", find("keyword_cache", {"_id": "hash1"})),
+        # job_queue_crud
+        ("job_queue_crud: lease_job", {"findAndModify": "jobs", "query": {
+            "status": {"$in": ["pending", "leased"]}, "run_at": {"$lte": NOW}}, "sort": {"run_at": 1},
+            "update": {"$set": {"status": "leased"}}}),
+    ]
+
+
+def _stages(plan) -> list:
+    """Every stage name in a (classic or SBE) winning plan tree."""
+    found = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            found.append(plan["stage"])
+        for value in plan.values():
+            found.extend(_stages(value))
+    elif isinstance(plan, list):
+        for value in plan:
+            found.extend(_stages(value))
+    return found
+
+
+def _describe(plan: dict) -> str:
+    """One-line summary of a plan, e.g. FETCH > IXSCAN {user_ID: 1, date: -1}."""
+    plan = plan.get("queryPlan", plan)
+    label = plan.get("stage", "?")
+    if "keyPattern" in plan:
+        keys = ", ".join(f"{k}: {v}" for k, v in plan["keyPattern"].items())
+        label += f" {{{keys}}}"
+    if "inputStage" in plan:
+        return f"{label} > {_describe(plan['inputStage'])}"
+    if "inputStages" in plan:
+        return f"{label} > (" + " | ".join(_describe(p) for p in plan["inputStages"]) + ")"
+    return label
+
+
+async def audit(uri: str = AUDIT_MONGODB_URI) -> bool:
+    """Run the audit. Returns True if every shape is served by an index."""
+    client = AsyncIOMotorClient(uri)
+    database = client[f"plan_audit_{ObjectId()}"]
+    try:
+        docs = seed_documents()
+        for collection_name, documents in docs.items():
+            await database[collection_name].insert_many(documents)
+        await create_indexes(database)
+        print()
+
+        shapes = query_shapes(docs)
+        problems = 0
+        for name, command in shapes:
+            result = await database.command({"explain": command, "verbosity": "executionStats"})
+            winning = result["queryPlanner"]["winningPlan"]
+            stats = result.get("executionStats", {})
+            stages = _stages(winning)
+
+            flags = []
+            if "COLLSCAN" in stages:
+                flags.append("COLLSCAN")
+            if "SORT" in stages:
+                flags.append("IN-MEMORY SORT")
+            problems += bool(flags)
+
+            print(f"{'FAIL' if flags else 'ok  '}  {name}")
+            print(f"      plan: {_describe(winning)}")
+            print(f"      docs examined: {stats.get('totalDocsExamined', '?')}   "
+                  f"keys examined: {stats.get('totalKeysExamined', '?')}   "
+                  f"returned: {stats.get('nReturned', '?')}" + (f"   <- {', '.join(flags)}" if flags else ""))
+
+        print(f"\n{problems} of {len(shapes)} query shapes not served by an index")
+        return problems == 0
+    finally:
+        await client.drop_database(database.name)
+        client.close()
+
+
+if __name__ == "__main__":
+    async def main():
+        ok = await audit()
+        sys.exit(0 if ok else 1)
+
+    asyncio.run(main())
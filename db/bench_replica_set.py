@@ -0,0 +1,103 @@
+# Description: benchmark - the mongo client settings from db/database.py against a local replica set.
+# concurrent "history" list reads (a user's journals, newest first) under each combination of wire compressor,
+# read preference and pool size; prints latency percentiles and throughput per combination.
+#
+#   BENCH_MONGODB_URI="mongodb://localhost:27017,localhost:27018,localhost:27019/?replicaSet=rs0" \
+#       python -m db.bench_replica_set
+#
+# a local 3-member set:  mongod --replSet rs0 --port 2701{7,8,9} --dbpath ...  then rs.initiate() in mongosh.
+# seeds a scratch collection in the bench database and drops it afterwards. compressors whose python module
+# isn't installed (zstd: zstandard, snappy: python-snappy) are skipped.
+# Created on 2026-10-18
+import asyncio
+import os
+import statistics
+import time
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import WriteConcern
+from pymongo.compression_support import validate_compressors
+
+BENCH_URI = os.getenv("BENCH_MONGODB_URI",
+                      "mongodb://localhost:27017,localhost:27018,localhost:27019/?replicaSet=rs0")
+BENCH_DB = os.getenv("BENCH_MONGODB_DB", "bench")
+
+USERS = 50
+DOCS_PER_USER = 100
+CONCURRENCY = 64
+READS = 2000
+
+COMPRESSORS = ["", "zlib", "snappy", "zstd"]
+READ_PREFERENCES = ["primary", "secondaryPreferred", "nearest"]
+POOL_SIZES = [10, 100]
+
+
+def _doc(user: int, i: int) -> dict:
+    # roughly a journal: compressible english-ish text plus a few small fields
+    return {"user_ID": f"bench{user}", "date": 1_700_000_000 + i * 3600, "title": f"entry {i}",
+            "content": ("today I went for a walk and thought about work, sleep and friends. " * 20)[:1200],
+            "star_IDs": [str(ObjectId()) for _ in range(3)]}
+
+
+async def seed(collection_name: str):
+    client = AsyncIOMotorClient(BENCH_URI)
+    collection = client[BENCH_DB].get_collection(collection_name, write_concern=WriteConcern(w="majority"))
+    await collection.create_index([("user_ID", 1), ("date", -1)])
+    for user in range(USERS):
+        await collection.insert_many([_doc(user, i) for i in range(DOCS_PER_USER)], ordered=False)
+    client.close()
+
+
+async def run(collection_name: str, compressor: str, read_preference: str, pool_size: int) -> dict:
+    options = {"maxPoolSize": pool_size, "readPreference": read_preference}
+    if compressor:
+        options["compressors"] = compressor
+    client = AsyncIOMotorClient(BENCH_URI, **options)
+    collection = client[BENCH_DB][collection_name]
+    # warm up the pool so connection setup isn't timed
+    await asyncio.gather(*(collection.find_one({}) for _ in range(min(pool_size, CONCURRENCY))))
+
+    samples = []
+    queue = iter(range(READS))
+
+    async def worker():
+        for n in queue:
+            start = time.perf_counter()
+            await collection.find({"user_ID": f"bench{n % USERS}"}).sort("date", -1).to_list(length=None)
+            samples.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(CONCURRENCY)))
+    elapsed = time.perf_counter() - start
+    client.close()
+
+    samples.sort()
+    return {"p50": statistics.median(samples), "p95": samples[int(len(samples) * 0.95) - 1],
+            "reads_per_s": READS / elapsed}
+
+
+async def bench_replica_set():
+    available = set(validate_compressors(None, ",".join(c for c in COMPRESSORS if c)))
+    collection_name = f"bench_rs_{ObjectId()}"
+    await seed(collection_name)
+    try:
+        print(f"{READS} reads of {DOCS_PER_USER} docs, {CONCURRENCY} concurrent:")
+        print(f"{'compressor':<10} {'read preference':<20} {'pool':>5} {'p50 ms':>8} {'p95 ms':>8} {'reads/s':>9}")
+        for compressor in COMPRESSORS:
+            if compressor and compressor not in available:
+                print(f"{compressor:<10} (skipped, python module not installed)")
+                continue
+            for read_preference in READ_PREFERENCES:
+                for pool_size in POOL_SIZES:
+                    r = await run(collection_name, compressor, read_preference, pool_size)
+                    print(f"{compressor or 'none':<10} {read_preference:<20} {pool_size:>5} "
+                          f"{r['p50']:8.2f} {r['p95']:8.2f} {r['reads_per_s']:9.0f}")
+    finally:
+        client = AsyncIOMotorClient(BENCH_URI)
+        await client[BENCH_DB].drop_collection(collection_name)
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(bench_replica_set())
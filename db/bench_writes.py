@@ -0,0 +1,69 @@
+# Description: benchmark - latency per write with and without the read-back round trip.
+# runs against the configured MONGODB_URI in a scratch collection that is dropped afterwards.
+# Created on 2026-10-18
+import statistics
+import time
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+
+from db.database import db
+
+N = 200
+
+
+def summarize(label: str, samples: list):
+    samples = sorted(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(f"{label:<32} median {statistics.median(samples):7.2f} ms   p95 {p95:7.2f} ms")
+    return statistics.median(samples)
+
+
+async def bench_writes():
+    collection = db[f"bench_writes_{ObjectId()}"]
+    try:
+        # warm up the connection pool
+        await collection.insert_one({"warmup": True})
+
+        old_insert, new_insert, old_update, new_update = [], [], [], []
+        ids = []
+        for i in range(N):
+            doc = {"user_ID": "bench", "date": i, "content": "x" * 500}
+
+            start = time.perf_counter()
+            result = await collection.insert_one(dict(doc))
+            await collection.find_one({"_id": result.inserted_id})
+            old_insert.append((time.perf_counter() - start) * 1000)
+
+            start = time.perf_counter()
+            new_doc = dict(doc)
+            await collection.insert_one(new_doc)
+            new_insert.append((time.perf_counter() - start) * 1000)
+            ids.append(new_doc["_id"])
+
+        for i, _id in enumerate(ids):
+            start = time.perf_counter()
+            await collection.update_one({"_id": _id}, {"$set": {"content": f"old {i}"}})
+            await collection.find_one({"_id": _id})
+            old_update.append((time.perf_counter() - start) * 1000)
+
+            start = time.perf_counter()
+            await collection.find_one_and_update(
+                {"_id": _id}, {"$set": {"content": f"new {i}"}}, return_document=ReturnDocument.AFTER
+            )
+            new_update.append((time.perf_counter() - start) * 1000)
+
+        print(f"{N} writes each:")
+        a = summarize("create: insert_one + find_one", old_insert)
+        b = summarize("create: insert_one only", new_insert)
+        c = summarize("update: update_one + find_one", old_update)
+        d = summarize("update: find_one_and_update", new_update)
+        print(f"saved per create: {a - b:.2f} ms   saved per update: {c - d:.2f} ms")
+    finally:
+        await collection.drop()
+
+
+if __name__ == "__main__":
+    import asyncio
+
+    asyncio.run(bench_writes())
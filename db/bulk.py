@@ -0,0 +1,50 @@
+# Description: shared helpers for multi-document operations (bulk inserts, multi-gets by ID).
+# Created on 2026-10-18
+from typing import Callable, List, Optional
+
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+
+async def insert_many_unordered(collection, docs: List[dict], serialize: Callable[[dict], dict]) -> List[dict]:
+    """
+    Insert all docs in one unordered insert_many (one failure doesn't stop the rest).
+
+    Returns:
+        One result per input doc, in input order:
+        {"status": "success", "doc": serialized doc} or {"status": "error", "error": str}
+    """
+    if not docs:
+        return []
+
+    docs = [dict(doc) for doc in docs]
+    errors = {}
+    try:
+        await collection.insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        for write_error in e.details.get("writeErrors", []):
+            errors[write_error["index"]] = write_error.get("errmsg", "write failed")
+
+    # insert_many assigns _id to every doc client-side, so the docs are the stored docs
+    return [
+        {"status": "error", "error": errors[i]} if i in errors else {"status": "success", "doc": serialize(doc)}
+        for i, doc in enumerate(docs)
+    ]
+
+
+async def find_by_ids(collection, ids: List[str], serialize: Callable[[dict], dict],
+                      projection: Optional[dict] = None) -> List[dict]:
+    """
+    Fetch many documents by string ID with a single $in query.
+
+    Results come back in the order of `ids`; IDs that are malformed or not found are skipped.
+    """
+    object_ids = list({ObjectId(i) for i in ids if ObjectId.is_valid(i)})
+    if not object_ids:
+        return []
+
+    by_id = {}
+    async for doc in collection.find({"_id": {"$in": object_ids}}, projection):
+        doc = serialize(doc)
+        by_id[doc["_id"]] = doc
+    return [by_id[i] for i in ids if i in by_id]
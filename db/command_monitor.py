@@ -0,0 +1,239 @@
+# Description: pymongo command monitoring - every command the client sends (find, aggregate, update, ...) is timed
+# and counted per collection and command, with a latency histogram and reply sizes. commands slower than
+# MONGODB_SLOW_MS are printed with the shape of their filter (values replaced by "?") and kept in a short log.
+# stats() is what GET /db_stats returns; a collection maps to its crud module (stars -> star_crud, ...).
+# Created on 2026-10-18
+import json
+import os
+import threading
+import time
+from collections import deque
+from collections.abc import Mapping
+from typing import Dict, List, Optional
+
+import bson
+from bson.raw_bson import RawBSONDocument
+from dotenv import load_dotenv
+from pymongo import monitoring
+
+load_dotenv()
+
+MONITOR_ENABLED = os.getenv("MONGODB_MONITOR", "true").lower() == "true"
+# commands at or over this many milliseconds are logged with their filter shape
+SLOW_MS = float(os.getenv("MONGODB_SLOW_MS", "100"))
+# how many slow commands stats() remembers
+SLOW_LOG_SIZE = int(os.getenv("MONGODB_SLOW_LOG_SIZE", "100"))
+
+# histogram bucket upper bounds, in ms (the last bucket is everything slower)
+BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+# documents of a batch encoded to estimate its size; bigger batches are extrapolated from these
+SIZE_SAMPLE_DOCS = 16
+# the part of a command that holds its filter, per command
+_FILTER_FIELDS = {"find": "filter", "count": "query", "distinct": "query", "findAndModify": "query"}
+
+
+def _shape(value):
+    """The value with every literal replaced by "?" (operators and field names kept)."""
+    if isinstance(value, Mapping):
+        return {k: _shape(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        if value and all(isinstance(v, Mapping) for v in value):
+            return [_shape(v) for v in value]
+        return ["?"]
+    return "?"
+
+
+def command_shape(command_name: str, command: Mapping) -> str:
+    """
+    Filter shape of a command, for grouping slow queries: the same query with other values has the same shape.
+
+    find {"user_ID": "a", "date": {"$lt": 5}}  ->  {"user_ID": "?", "date": {"$lt": "?"}}
+    aggregate pipelines keep their $match shapes and the names of the other stages.
+    """
+    if command_name in _FILTER_FIELDS:
+        shape = _shape(command.get(_FILTER_FIELDS[command_name]) or {})
+        if command.get("sort"):
+            shape = {"filter": shape, "sort": list(command["sort"])}
+    elif command_name in ("update", "delete"):
+        statements = command.get("updates" if command_name == "update" else "deletes") or []
+        shape = {"q": _shape(statements[0].get("q") or {}), "statements": len(statements)} if statements else {}
+    elif command_name == "aggregate":
+        shape = [
+            {name: _shape(body)} if name == "$match" else name
+            for stage in command.get("pipeline") or [] for name, body in stage.items()
+        ]
+    elif command_name == "insert":
+        shape = {"documents": len(command.get("documents") or [])}
+    else:
+        shape = {}
+    return json.dumps(shape, default=str)
+
+
+def _doc_size(doc) -> int:
+    return len(doc.raw) if isinstance(doc, RawBSONDocument) else len(bson.encode(doc))
+
+
+def reply_size(reply) -> int:
+    """
+    Approximate reply size in bytes. Raw documents are measured exactly; a big cursor batch of dicts is
+    extrapolated from its first SIZE_SAMPLE_DOCS documents, since re-encoding a whole history read would
+    cost about as much as the driver spent decoding it.
+    """
+    if isinstance(reply, RawBSONDocument):
+        return len(reply.raw)
+    cursor = reply.get("cursor") if isinstance(reply, Mapping) else None
+    if not isinstance(cursor, Mapping):
+        return _doc_size(reply)
+    batch = cursor.get("firstBatch", cursor.get("nextBatch")) or []
+    sample = batch[:SIZE_SAMPLE_DOCS]
+    sampled = sum(_doc_size(doc) for doc in sample)
+    return sampled * len(batch) // len(sample) if sample else 0
+
+
+class _Stats:
+    """Counters for one (collection, command) pair."""
+
+    __slots__ = ("count", "failures", "total_ms", "max_ms", "buckets", "reply_bytes", "max_reply_bytes")
+
+    def __init__(self):
+        self.count = 0
+        self.failures = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+        self.reply_bytes = 0
+        self.max_reply_bytes = 0
+
+    def add(self, ms: float, size: Optional[int]):
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+        self.buckets[next((i for i, bound in enumerate(BUCKETS_MS) if ms <= bound), len(BUCKETS_MS))] += 1
+        if size is None:
+            self.failures += 1
+        else:
+            self.reply_bytes += size
+            self.max_reply_bytes = max(self.max_reply_bytes, size)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-th quantile, capped at the slowest command seen."""
+        if not self.count:
+            return None
+        rank, seen = q * self.count, 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank:
+                return round(min(BUCKETS_MS[i], self.max_ms) if i < len(BUCKETS_MS) else self.max_ms, 2)
+        return round(self.max_ms, 2)
+
+    def to_dict(self) -> dict:
+        succeeded = self.count - self.failures
+        return {
+            "count": self.count,
+            "failures": self.failures,
+            "total_ms": round(self.total_ms, 2),
+            "mean_ms": round(self.total_ms / self.count, 2) if self.count else None,
+            "p50_ms": self.percentile(0.5),
+            "p95_ms": self.percentile(0.95),
+            "p99_ms": self.percentile(0.99),
+            "max_ms": round(self.max_ms, 2),
+            "histogram": {f"<={b}ms": n for b, n in zip(BUCKETS_MS, self.buckets)} | {"slower": self.buckets[-1]},
+            "reply_bytes": self.reply_bytes,
+            "mean_reply_bytes": self.reply_bytes // succeeded if succeeded else None,
+            "max_reply_bytes": self.max_reply_bytes,
+        }
+
+
+class CommandMonitor(monitoring.CommandListener):
+    """
+    Command listener collecting per-collection, per-command latency and reply sizes.
+
+    Motor runs pymongo on executor threads, so events can arrive from several threads at once;
+    everything shared is behind one lock. Shapes are only computed for slow commands.
+    """
+
+    def __init__(self, slow_ms: float = SLOW_MS, slow_log_size: int = SLOW_LOG_SIZE):
+        self.slow_ms = slow_ms
+        self._lock = threading.Lock()
+        # (connection, request id) -> (collection, command name, command) of commands in flight
+        self._pending: Dict[tuple, tuple] = {}
+        self._stats: Dict[tuple, _Stats] = {}
+        self._slow = deque(maxlen=slow_log_size)
+
+    def started(self, event):
+        command = event.command
+        target = command.get(event.command_name)
+        if event.command_name == "getMore":
+            target = command.get("collection")
+        collection = target if isinstance(target, str) else "(db)"
+        with self._lock:
+            self._pending[(event.connection_id, event.request_id)] = (collection, event.command_name, command)
+
+    def succeeded(self, event):
+        self._finish(event, reply_size(event.reply))
+
+    def failed(self, event):
+        self._finish(event, None, event.failure)
+
+    def _finish(self, event, size: Optional[int], failure=None):
+        ms = event.duration_micros / 1000
+        with self._lock:
+            pending = self._pending.pop((event.connection_id, event.request_id), None)
+            if pending is None:
+                return
+            collection, command_name, command = pending
+            stats = self._stats.get((collection, command_name))
+            if stats is None:
+                stats = self._stats[(collection, command_name)] = _Stats()
+            stats.add(ms, size)
+        if ms < self.slow_ms:
+            return
+
+        shape = command_shape(command_name, command)
+        entry = {"at": int(time.time()), "collection": collection, "command": command_name,
+                 "ms": round(ms, 2), "reply_bytes": size, "shape": shape}
+        if failure is not None:
+            entry["failure"] = failure.get("codeName") or failure.get("errmsg")
+        with self._lock:
+            self._slow.append(entry)
+        print(f"Slow mongo command: {command_name} {collection} {ms:.1f} ms, shape {shape}"
+              + (f", failed: {entry['failure']}" if failure is not None else f", reply {size} bytes"))
+
+    def stats(self, collection: Optional[str] = None) -> dict:
+        """
+        Everything recorded so far.
+
+        Args:
+            collection: Only this collection's commands and slow log (optional)
+
+        Returns:
+            {"slow_ms", "commands": [{"collection", "command", "count", "failures", "total_ms", "mean_ms",
+             "p50_ms", "p95_ms", "p99_ms", "max_ms", "histogram", "reply_bytes", ...}] most total time first,
+             "slow": recent slow commands, newest first}
+        """
+        with self._lock:
+            commands = [
+                {"collection": c, "command": name, **s.to_dict()}
+                for (c, name), s in self._stats.items() if collection is None or c == collection
+            ]
+            slow = [e for e in reversed(self._slow) if collection is None or e["collection"] == collection]
+        commands.sort(key=lambda s: s["total_ms"], reverse=True)
+        return {"slow_ms": self.slow_ms, "commands": commands, "slow": slow}
+
+    def reset(self):
+        """Start counting from zero (e.g. before a benchmark run)."""
+        with self._lock:
+            self._stats.clear()
+            self._slow.clear()
+
+
+monitor = CommandMonitor()
+
+
+def event_listeners() -> List[monitoring.CommandListener]:
+    """Listeners to register on the client (none if MONGODB_MONITOR=false)."""
+    return [monitor] if MONITOR_ENABLED else []
+
+
+def stats(collection: Optional[str] = None) -> dict:
+    return {"enabled": MONITOR_ENABLED, **monitor.stats(collection)}
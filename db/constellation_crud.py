@@ -1,8 +1,12 @@
 # Description: CRUD operations for Constellations
 # Created on 2026-01-31
 
-from db.database import constellations_collection, stars_collection
+from db import loaders
+from db.bulk import find_by_ids
+from db.database import constellations_collection, reads_for, stars_collection
 from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 
@@ -13,27 +17,97 @@ def serialize_constellation(constellation) -> dict:
     return constellation
 
 
+loaders.register(
+    "constellations",
+    lambda constellation_ids: find_by_ids(constellations_collection, constellation_ids, serialize_constellation)
+)
+
+
 async def create_constellation(constellation_data: dict) -> dict:
-    result = await constellations_collection.insert_one(constellation_data)
-    constellation = await constellations_collection.find_one({"_id": result.inserted_id})
+    constellation = dict(constellation_data)
+    await constellations_collection.insert_one(constellation)
     return serialize_constellation(constellation)
 
 
+async def get_or_create_constellation(name: str) -> dict:
+    """
+    Find the global constellation with this name, creating it if it doesn't exist yet.
+
+    Single atomic upsert on the unique name index, so concurrent callers can't create duplicates.
+    """
+    constellation = await constellations_collection.find_one_and_update(
+        {"name": name},
+        {"$setOnInsert": {"name": name}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    return serialize_constellation(constellation)
+
+
+async def get_or_create_constellations(names: List[str]) -> Dict[str, str]:
+    """
+    Resolve many global constellation names to IDs, creating the missing ones.
+
+    One $in read, plus one unordered bulk upsert only if some names are new (their _id is
+    assigned here, so nothing is read back unless another request created them first).
+
+    Returns:
+        {name: constellation_id}
+    """
+    names = list(dict.fromkeys(names))
+    ids = {}
+    async for constellation in constellations_collection.find({"name": {"$in": names}}, {"name": 1}):
+        ids[constellation["name"]] = str(constellation["_id"])
+
+    missing = [name for name in names if name not in ids]
+    if not missing:
+        return ids
+
+    new_ids = {name: ObjectId() for name in missing}
+    ops = [UpdateOne({"name": name}, {"$setOnInsert": {"_id": new_ids[name]}}, upsert=True) for name in missing]
+    try:
+        result = await constellations_collection.bulk_write(ops, ordered=False)
+        upserted = result.upserted_ids
+    except BulkWriteError as e:
+        # duplicate key = another request created it first; the lookup below picks it up
+        if any(err.get("code") != 11000 for err in e.details.get("writeErrors", [])):
+            raise
+        upserted = {u["index"]: u["_id"] for u in e.details.get("upserted", [])}
+
+    raced = []
+    for i, name in enumerate(missing):
+        if i in upserted:
+            ids[name] = str(new_ids[name])
+        else:
+            raced.append(name)
+    if raced:
+        async for constellation in constellations_collection.find({"name": {"$in": raced}}, {"name": 1}):
+            ids[constellation["name"]] = str(constellation["_id"])
+    return ids
+
+
 async def get_constellation_by_id(constellation_id: str) -> Optional[dict]:
-    """Get a constellation by its ID."""
+    """Get a constellation by its ID (batched and remembered within a request, see db/loaders.py)."""
+    if loaders.get_loader("constellations"):
+        return await loaders.load("constellations", constellation_id)
     constellation = await constellations_collection.find_one({"_id": ObjectId(constellation_id)})
     return serialize_constellation(constellation) if constellation else None
 
 
+async def get_constellations_by_ids(constellation_ids: List[str]) -> List[dict]:
+    """Get many constellations in one $in query, in the order of `constellation_ids` (missing ones skipped)."""
+    if loaders.get_loader("constellations"):
+        return await loaders.load_many("constellations", constellation_ids)
+    return await find_by_ids(constellations_collection, constellation_ids, serialize_constellation)
+
+
 async def get_constellation_with_stars(constellation_id: str, user_id: str) -> Optional[Dict[str, Any]]:
     """Get a constellation with all its stars for a specific user."""
     try:
-        constellation = await constellations_collection.find_one({"_id": ObjectId(constellation_id)})
+        constellation = await get_constellation_by_id(constellation_id)
         if not constellation:
             return None
 
-        constellation["_id"] = str(constellation["_id"])
-
         # Get user's stars for this constellation
         cursor = stars_collection.find({
             "user_ID": user_id,
@@ -53,31 +127,67 @@ async def get_constellation_with_stars(constellation_id: str, user_id: str) -> O
         return None
 
 
+def _user_stars_lookup(user_ID: str, star_pipeline: Optional[list] = None) -> List[dict]:
+    """
+    Pipeline stages that attach the user's stars to each constellation as `stars`.
+
+    Stars store the constellation's _id as a string, so the join key is the stringified _id;
+    the lookup is served by the (user_ID, constellation_ID) index on stars.
+    """
+    return [
+        {"$addFields": {"_id": {"$toString": "$_id"}}},
+        {"$lookup": {
+            "from": stars_collection.name,
+            "localField": "_id",
+            "foreignField": "constellation_ID",
+            "pipeline": [
+                {"$match": {"user_ID": user_ID}},
+                {"$addFields": {"_id": {"$toString": "$_id"}}},
+            ] + (star_pipeline or []),
+            "as": "stars",
+        }},
+    ]
+
+
 async def get_all_constellations(user_ID: Optional[str] = None, include_stars: bool = False) -> List[dict]:
-    """Get all constellations, optionally with user's stars populated."""
+    """Get all constellations, optionally with user's stars populated (one aggregation, not a query per constellation)."""
+    if include_stars and user_ID:
+        pipeline = [{"$sort": {"name": 1}}] + _user_stars_lookup(user_ID)
+        return await constellations_collection.aggregate(pipeline).to_list(length=None)
+
     cursor = constellations_collection.find().sort("name", 1)
     constellations = []
-
     async for constellation in cursor:
-        constellation["_id"] = str(constellation["_id"])
-
-        if include_stars and user_ID:
-            # Get user's stars for this constellation
-            stars_cursor = stars_collection.find({
-                "user_ID": user_ID,
-                "constellation_ID": str(constellation["_id"])
-            })
-
-            stars = []
-            async for star in stars_cursor:
-                star["_id"] = str(star["_id"])
-                stars.append(star)
-
-            constellation["stars"] = stars
+        constellations.append(serialize_constellation(constellation))
+    return constellations
 
-        constellations.append(constellation)
 
-    return constellations
+async def get_constellation_map(user_ID: str) -> List[dict]:
+    """
+    Every constellation with the user's stars, journal counts and totals, in one round trip.
+
+    Stars are sorted by journal count and constellations by total journals (both descending),
+    all inside the aggregation.
+
+    Returns:
+        List of {constellation_id, constellation_name, description, star_count, total_journals, stars}
+    """
+    pipeline = _user_stars_lookup(user_ID, [
+        {"$addFields": {"journal_count": {"$size": {"$ifNull": ["$journal_IDs", []]}}}},
+        {"$sort": {"journal_count": -1, "name": 1}},
+    ]) + [
+        {"$project": {
+            "_id": 0,
+            "constellation_id": "$_id",
+            "constellation_name": "$name",
+            "description": {"$ifNull": ["$description", ""]},
+            "star_count": {"$size": "$stars"},
+            "total_journals": {"$sum": "$stars.journal_count"},
+            "stars": 1,
+        }},
+        {"$sort": {"total_journals": -1, "constellation_name": 1}},
+    ]
+    return await reads_for("analytics", constellations_collection).aggregate(pipeline).to_list(length=None)
 
 
 async def delete_constellation(constellation_id: str) -> bool:
@@ -90,6 +200,7 @@ async def delete_constellation(constellation_id: str) -> bool:
             return False
 
         result = await constellations_collection.delete_one({"_id": ObjectId(constellation_id)})
+        loaders.forget("constellations", constellation_id)
         return result.deleted_count > 0
     except Exception as e:
         print(f"Error deleting constellation: {e}")
@@ -1,14 +1,84 @@
 import os
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Optional
+
 import certifi
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
 from motor.motor_asyncio import AsyncIOMotorClient
 from dotenv import load_dotenv
+from pymongo.compression_support import validate_compressors
+from pymongo.read_concern import ReadConcern
+from pymongo.read_preferences import Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred
+
+from db import command_monitor
 
 load_dotenv()
 
 MONGO_URI = os.getenv("MONGODB_URI")
 MONGO_DB_NAME = os.getenv("MONGODB_DB")
 
-client = AsyncIOMotorClient(MONGO_URI, tlsCAFile=certifi.where())
+
+def _env_int(name: str) -> Optional[int]:
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else None
+
+
+# connection pool (unset = driver default). max idle / wait queue are in milliseconds
+MONGO_MIN_POOL_SIZE = _env_int("MONGODB_MIN_POOL_SIZE")
+MONGO_MAX_POOL_SIZE = _env_int("MONGODB_MAX_POOL_SIZE")
+MONGO_MAX_IDLE_TIME_MS = _env_int("MONGODB_MAX_IDLE_TIME_MS")
+MONGO_WAIT_QUEUE_TIMEOUT_MS = _env_int("MONGODB_WAIT_QUEUE_TIMEOUT_MS")
+# wire compression in order of preference, e.g. "zstd,snappy,zlib" (zstd / snappy need their python modules installed)
+MONGO_COMPRESSORS = os.getenv("MONGODB_COMPRESSORS", "")
+MONGO_ZLIB_LEVEL = _env_int("MONGODB_ZLIB_LEVEL")
+
+# reads that may be served by secondaries, each with its own read preference / read concern:
+#   MONGODB_HISTORY_READ_PREFERENCE=secondaryPreferred   MONGODB_HISTORY_READ_CONCERN=local
+#   MONGODB_HISTORY_MAX_STALENESS_SECONDS=120   (>= 90, only for non-primary modes)
+# history = a user's journal / quiz / star lists and their data version, analytics = rollups and the constellation map.
+# everything else (writes, reads by _id, login) always uses the primary.
+READ_USE_CASES = ("history", "analytics")
+
+_READ_PREFERENCES = {
+    "primary": Primary,
+    "primarypreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondarypreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+
+def _read_settings(use_case: str) -> dict:
+    prefix = f"MONGODB_{use_case.upper()}_"
+    mode = os.getenv(prefix + "READ_PREFERENCE", "primary").lower()
+    if mode not in _READ_PREFERENCES:
+        raise ValueError(f"{prefix}READ_PREFERENCE must be one of {', '.join(_READ_PREFERENCES)}")
+    staleness = _env_int(prefix + "MAX_STALENESS_SECONDS") or -1
+    preference = Primary() if mode == "primary" else _READ_PREFERENCES[mode](max_staleness=staleness)
+    return {"read_preference": preference, "read_concern": ReadConcern(os.getenv(prefix + "READ_CONCERN") or None)}
+
+
+READ_SETTINGS = {use_case: _read_settings(use_case) for use_case in READ_USE_CASES}
+
+
+def _client_options() -> dict:
+    options = {
+        "tlsCAFile": certifi.where(),
+        # per-command latency / reply size stats and the slow-command log (db/command_monitor.py)
+        "event_listeners": command_monitor.event_listeners(),
+        "minPoolSize": MONGO_MIN_POOL_SIZE,
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "maxIdleTimeMS": MONGO_MAX_IDLE_TIME_MS,
+        "waitQueueTimeoutMS": MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        "compressors": MONGO_COMPRESSORS or None,
+        "zlibCompressionLevel": MONGO_ZLIB_LEVEL,
+    }
+    return {k: v for k, v in options.items() if v is not None}
+
+
+client = AsyncIOMotorClient(MONGO_URI, **_client_options())
 db = client[MONGO_DB_NAME]
 
 # collections
@@ -17,5 +87,90 @@ users_collection = db["users"]
 journals_collection = db["journals"]
 stars_collection = db["stars"]
 quiz_entries_collection = db["quiz"]
+quiz_rollups_collection = db["quiz_rollups"]
 #  non-user specific
 constellations_collection = db["constellations"]
+#  background work
+jobs_collection = db["jobs"]
+#  per-user data versions (ETags / cache validation)
+user_versions_collection = db["user_versions"]
+#  schema bookkeeping (index versions, migration lock)
+meta_collection = db["meta"]
+#  caches
+keyword_cache_collection = db["keyword_cache"]
+
+# opt-in read mode for big list reads: documents stay as the raw BSON bytes off the wire and are only
+# decoded when a field is accessed (or when api/fast_json.py encodes them), instead of becoming dicts up front
+RAW_CODEC_OPTIONS = CodecOptions(document_class=RawBSONDocument)
+
+
+def raw(collection):
+    """The same collection, returning RawBSONDocument instead of dict."""
+    return collection.with_options(codec_options=RAW_CODEC_OPTIONS)
+
+
+def reads_for(use_case: str, collection):
+    """The same collection, reading with the read preference / read concern configured for `use_case`."""
+    return collection.with_options(**READ_SETTINGS[use_case])
+
+
+# causally consistent session for the current request's history reads (see causal_reads)
+_read_session: ContextVar = ContextVar("read_session", default=None)
+
+
+def read_session():
+    """Session to pass to history reads, None when they all go to the primary anyway."""
+    return _read_session.get()
+
+
+@asynccontextmanager
+async def causal_reads(after=None):
+    """
+    Make the history reads inside see each other in order, even when served by different secondaries:
+    data read after a user's version is at least as new as that version, so an ETag / history cache
+    entry never claims more than the data has. No-op while history reads use the primary.
+
+    Args:
+        after: A session whose reads the new one must not go back behind (for work that outlives
+            the first scope, like a streamed response)
+    """
+    if _read_session.get() is not None or isinstance(READ_SETTINGS["history"]["read_preference"], Primary):
+        yield
+        return
+    async with await client.start_session(causal_consistency=True) as session:
+        if after is not None and after.cluster_time is not None:
+            session.advance_cluster_time(after.cluster_time)
+            session.advance_operation_time(after.operation_time)
+        token = _read_session.set(session)
+        try:
+            yield
+        finally:
+            _read_session.reset(token)
+
+
+def client_settings() -> dict:
+    """The settings the client is actually running with (compressors the driver can't load are dropped)."""
+    pool = client.options.pool_options
+    return {
+        "min_pool_size": pool.min_pool_size,
+        "max_pool_size": pool.max_pool_size,
+        "max_idle_time_s": pool.max_idle_time_seconds,
+        "wait_queue_timeout_s": pool.wait_queue_timeout,
+        "compressors": validate_compressors(None, MONGO_COMPRESSORS) if MONGO_COMPRESSORS else [],
+        "slow_ms": command_monitor.SLOW_MS if command_monitor.MONITOR_ENABLED else "off",
+        "reads": {
+            use_case: {
+                "read_preference": settings["read_preference"].mongos_mode,
+                "max_staleness_s": settings["read_preference"].max_staleness,
+                "read_concern": settings["read_concern"].level or "server default",
+            }
+            for use_case, settings in READ_SETTINGS.items()
+        },
+    }
+
+
+def log_client_settings():
+    settings = client_settings()
+    reads = ", ".join(f"{use_case} {r['read_preference']}/{r['read_concern']}"
+                      for use_case, r in settings.pop("reads").items())
+    print("✓ mongo client: " + ", ".join(f"{k}={v}" for k, v in settings.items()) + f", reads: {reads}")
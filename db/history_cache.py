@@ -0,0 +1,99 @@
+# Description: in-process cache of each user's full journal + quiz history (what /get_all and the AI prompt load).
+# LRU over users, bounded by user count and approximate bytes. every db-layer write to a user's journals or
+# quizzes bumps their version (db/user_versions.py) and invalidates them here; entries are also tagged with the
+# version they were loaded at, so a write made by another worker process is noticed too, and expire after
+# DATA_VERSION_MAX_AGE_SECONDS in case a version bump was missed.
+# Created on 2026-10-18
+import os
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+from dotenv import load_dotenv
+
+from db.lru_cache import LRUCache
+
+load_dotenv()
+
+HISTORY_CACHE_MAX_USERS = int(os.getenv("HISTORY_CACHE_MAX_USERS", "500"))
+HISTORY_CACHE_MAX_BYTES = int(os.getenv("HISTORY_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# same setting as db/user_versions.py (not imported: user_versions imports this module)
+HISTORY_CACHE_MAX_AGE_SECONDS = int(os.getenv("DATA_VERSION_MAX_AGE_SECONDS", "300"))
+
+# user_ID -> {field selection: (version, expires at (monotonic), (journals, quizzes))}
+_cache = LRUCache(HISTORY_CACHE_MAX_USERS, HISTORY_CACHE_MAX_BYTES)
+# loads in flight per user; invalidate() drops them so a load that raced a write isn't cached
+_loading: Dict[str, Set[object]] = {}
+_hits = 0
+_misses = 0
+_invalidations = 0
+
+
+def _variant(fields: Optional[List[str]]):
+    return tuple(sorted(set(fields))) if fields else None
+
+
+async def get_history(user_ID: str, fields: Optional[List[str]], version: int,
+                      load: Callable[[], Awaitable[tuple]]) -> tuple:
+    """
+    Return the cached (journals, quizzes) for this user and field selection, or call `load()` and cache it.
+
+    `version` is the user's current data version, read before calling; an entry loaded at any
+    other version, or more than HISTORY_CACHE_MAX_AGE_SECONDS ago, is stale. The returned lists are shared with the cache: callers must not
+    modify them or their documents.
+    """
+    global _hits, _misses
+    variant = _variant(fields)
+    now = time.monotonic()
+    entry = _cache.get(user_ID)
+    if entry is not None and variant in entry and entry[variant][0] == version and entry[variant][1] > now:
+        _hits += 1
+        return entry[variant][2]
+
+    _misses += 1
+    token = object()
+    _loading.setdefault(user_ID, set()).add(token)
+    try:
+        value = await load()
+    finally:
+        pending = _loading.get(user_ID)
+        still_valid = pending is not None and token in pending
+        if still_valid:
+            pending.discard(token)
+            if not pending:
+                del _loading[user_ID]
+
+    if still_valid:
+        entry = {k: v for k, v in (_cache.pop(user_ID) or {}).items() if v[0] == version and v[1] > now}
+        entry[variant] = (version, now + HISTORY_CACHE_MAX_AGE_SECONDS, value)
+        _cache.set(user_ID, entry)
+    return value
+
+
+def invalidate(*user_IDs: str):
+    """Forget the cached history of these users (call after writing any of their journals / quizzes)."""
+    global _invalidations
+    for user_ID in user_IDs:
+        if user_ID is None:
+            continue
+        _invalidations += 1
+        _cache.pop(user_ID)
+        _loading.pop(user_ID, None)
+
+
+def clear():
+    _cache.clear()
+    _loading.clear()
+
+
+def stats() -> dict:
+    """Per-request hit rate (a user cached under a different field selection counts as a miss)."""
+    lookups = _hits + _misses
+    return {
+        "users": len(_cache),
+        "bytes": _cache.bytes,
+        "hits": _hits,
+        "misses": _misses,
+        "hit_rate": _hits / lookups if lookups else 0.0,
+        "invalidations": _invalidations,
+        "evictions": _cache.evictions,
+    }
@@ -0,0 +1,151 @@
+# Description: versioned index migrations.
+# INDEX_SPECS (db/setup_indexes.py) is checksummed per collection and the applied checksums are stored in the
+# meta collection. On startup a worker compares checksums (one read); only when they differ does one worker,
+# holding a lock, bring the changed collections' indexes in line with the spec while the others wait.
+# the names of the indexes it created are stored too, and only those are ever dropped.
+# Created on 2026-10-18
+import asyncio
+import hashlib
+import json
+import os
+import socket
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict
+
+from pymongo.errors import DuplicateKeyError
+
+from db.database import db, meta_collection
+from db.setup_indexes import INDEX_SPECS
+
+INDEX_STATE_ID = "index_state"
+MIGRATION_LOCK_ID = "index_migration_lock"
+# a worker that dies mid-migration loses the lock after this long
+MIGRATION_LOCK_SECONDS = int(os.getenv("INDEX_MIGRATION_LOCK_SECONDS", "600"))
+MIGRATION_WAIT_SECONDS = int(os.getenv("INDEX_MIGRATION_WAIT_SECONDS", "900"))
+# also drop indexes this tool never created (added by hand, or missing from INDEX_SPECS); off by default
+DROP_UNKNOWN_INDEXES = os.getenv("INDEX_MIGRATIONS_DROP_UNKNOWN", "false").lower() == "true"
+
+# index options we manage; anything else on an existing index is left alone
+MANAGED_OPTIONS = ("unique", "sparse", "expireAfterSeconds", "partialFilterExpression")
+
+
+def index_name(keys: list) -> str:
+    """Mongo's default index name, e.g. [("user_ID", 1), ("date", -1)] -> "user_ID_1_date_-1"."""
+    return "_".join(f"{field}_{direction}" for field, direction in keys)
+
+
+def spec_checksums(specs: dict = INDEX_SPECS) -> Dict[str, str]:
+    """Checksum of each collection's index spec."""
+    checksums = {}
+    for collection_name, indexes in specs.items():
+        canonical = json.dumps([[list(map(list, keys)), options] for keys, options in indexes], sort_keys=True)
+        checksums[collection_name] = hashlib.sha256(canonical.encode()).hexdigest()
+    return checksums
+
+
+async def _migrate_collection(collection_name: str, indexes: list, managed: set) -> list:
+    """
+    Create missing indexes, rebuild ones whose options changed, drop ones no longer in the spec.
+
+    Only indexes this tool created before (`managed`, recorded in the meta collection) are dropped;
+    any other index not in the spec is reported and left in place unless INDEX_MIGRATIONS_DROP_UNKNOWN=true.
+
+    Returns:
+        Names of the indexes now managed on this collection
+    """
+    collection = db[collection_name]
+    existing = {index["name"]: index async for index in collection.list_indexes()}
+    wanted = {index_name(keys): (keys, options) for keys, options in indexes}
+
+    for name, (keys, options) in wanted.items():
+        current = existing.get(name)
+        if current is not None:
+            if all(current.get(opt) == options.get(opt) for opt in MANAGED_OPTIONS):
+                continue
+            print(f"  rebuilding {collection_name}.{name} (options changed)")
+            await collection.drop_index(name)
+        else:
+            print(f"  creating {collection_name}.{name}")
+        await collection.create_index(keys, **options)
+
+    for name in existing:
+        if name == "_id_" or name in wanted:
+            continue
+        if name in managed or DROP_UNKNOWN_INDEXES:
+            print(f"  dropping {collection_name}.{name} (no longer in spec)")
+            await collection.drop_index(name)
+        else:
+            print(f"  keeping {collection_name}.{name} (not in spec and not created by migrations; "
+                  f"INDEX_MIGRATIONS_DROP_UNKNOWN=true drops it)")
+    return sorted(wanted)
+
+
+async def _try_lock(owner: str) -> bool:
+    now = datetime.now(timezone.utc)
+    try:
+        # matches only an expired lock; otherwise the upsert collides with the live lock's _id
+        await meta_collection.find_one_and_update(
+            {"_id": MIGRATION_LOCK_ID, "expires_at": {"$lt": now}},
+            {"$set": {"owner": owner, "expires_at": now + timedelta(seconds=MIGRATION_LOCK_SECONDS)}},
+            upsert=True
+        )
+        return True
+    except DuplicateKeyError:
+        return False
+
+
+async def _release_lock(owner: str):
+    await meta_collection.delete_one({"_id": MIGRATION_LOCK_ID, "owner": owner})
+
+
+async def _pending_collections(wanted: Dict[str, str]) -> list:
+    state = await meta_collection.find_one({"_id": INDEX_STATE_ID}) or {}
+    applied = state.get("checksums", {})
+    return [name for name, checksum in wanted.items() if applied.get(name) != checksum]
+
+
+async def ensure_indexes():
+    """
+    Bring indexes up to date with INDEX_SPECS, doing nothing but one read when they already are.
+
+    Safe to call from every worker at startup: only the worker holding the migration lock runs DDL,
+    the rest wait for it to finish.
+    """
+    wanted = spec_checksums()
+    pending = await _pending_collections(wanted)
+    if not pending:
+        print("✓ Database indexes up to date")
+        return
+
+    owner = f"{socket.gethostname()}-{os.getpid()}"
+    deadline = time.monotonic() + MIGRATION_WAIT_SECONDS
+    while not await _try_lock(owner):
+        if time.monotonic() > deadline:
+            print("Gave up waiting for the index migration lock; starting with indexes as they are")
+            return
+        await asyncio.sleep(2)
+        pending = await _pending_collections(wanted)
+        if not pending:
+            print("✓ Database indexes migrated by another worker")
+            return
+
+    try:
+        # another worker may have finished between our check and getting the lock
+        pending = await _pending_collections(wanted)
+        managed = (await meta_collection.find_one({"_id": INDEX_STATE_ID}) or {}).get("managed", {})
+        for collection_name in pending:
+            print(f"Migrating {collection_name} indexes...")
+            names = await _migrate_collection(collection_name, INDEX_SPECS[collection_name],
+                                              set(managed.get(collection_name, [])))
+            await meta_collection.update_one(
+                {"_id": INDEX_STATE_ID},
+                {"$set": {f"checksums.{collection_name}": wanted[collection_name],
+                          f"managed.{collection_name}": names,
+                          "updated_at": datetime.now(timezone.utc)},
+                 "$inc": {"version": 1}},
+                upsert=True
+            )
+        print(f"✓ Database indexes migrated ({len(pending)} collections changed)")
+    finally:
+        await _release_lock(owner)
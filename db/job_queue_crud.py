@@ -0,0 +1,124 @@
+# Description: durable background job queue stored in mongo.
+# workers lease a job (so a crashed worker's job is picked up again once the lease runs out),
+# then mark it done, or failed with a delayed retry until it runs out of attempts.
+# run_at is when a job may next be picked up: its due time while pending, its lease expiry while leased,
+# so one (status, run_at) index serves every lease query.
+# Created on 2026-10-18
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+from pymongo import ReturnDocument
+
+from db.database import jobs_collection
+
+# job statuses
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+DEAD = "dead"
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _job_document(job_type: str, payload: dict, max_attempts: int, now: datetime) -> dict:
+    return {
+        "type": job_type,
+        "payload": payload,
+        "status": PENDING,
+        "attempts": 0,
+        "max_attempts": max_attempts,
+        "run_at": now,
+        "created_at": now,
+    }
+
+
+async def enqueue_job(job_type: str, payload: dict, max_attempts: int = 5) -> str:
+    """
+    Add a job to the queue.
+
+    Args:
+        job_type: Name of the handler that should run it
+        payload: Arguments for the handler (must be BSON-serializable)
+        max_attempts: Give up (status "dead") after this many failed runs
+
+    Returns:
+        The new job's ID
+    """
+    result = await jobs_collection.insert_one(_job_document(job_type, payload, max_attempts, _now()))
+    return str(result.inserted_id)
+
+
+async def enqueue_jobs(jobs: List[tuple], max_attempts: int = 5) -> int:
+    """Add many (job_type, payload) jobs with one insert_many. Returns how many were queued."""
+    if not jobs:
+        return 0
+    now = _now()
+    result = await jobs_collection.insert_many(
+        [_job_document(job_type, payload, max_attempts, now) for job_type, payload in jobs]
+    )
+    return len(result.inserted_ids)
+
+
+async def lease_job(worker_id: str, lease_seconds: int) -> Optional[dict]:
+    """
+    Atomically claim the oldest runnable job.
+
+    A job is runnable if it is pending and due, or if another worker's lease on it expired.
+
+    Returns:
+        The leased job document, or None if nothing is runnable
+    """
+    now = _now()
+    return await jobs_collection.find_one_and_update(
+        {"status": {"$in": [PENDING, LEASED]}, "run_at": {"$lte": now}},
+        {
+            "$set": {
+                "status": LEASED,
+                "lease_owner": worker_id,
+                "run_at": now + timedelta(seconds=lease_seconds),
+            },
+            "$inc": {"attempts": 1},
+        },
+        sort=[("run_at", 1)],
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+async def renew_lease(job: dict, worker_id: str, lease_seconds: int) -> bool:
+    """Push a running job's lease expiry forward (heartbeat). False if the lease was already lost to another worker."""
+    result = await jobs_collection.update_one(
+        {"_id": job["_id"], "status": LEASED, "lease_owner": worker_id},
+        {"$set": {"run_at": _now() + timedelta(seconds=lease_seconds)}}
+    )
+    return result.matched_count > 0
+
+
+async def complete_job(job: dict, worker_id: str) -> bool:
+    """Mark a leased job as done. False if the lease was lost to another worker."""
+    result = await jobs_collection.update_one(
+        {"_id": job["_id"], "status": LEASED, "lease_owner": worker_id},
+        {"$set": {"status": DONE, "completed_at": _now()},
+         "$unset": {"lease_owner": ""}}
+    )
+    return result.modified_count > 0
+
+
+async def fail_job(job: dict, worker_id: str, error: str, retry_delay_seconds: float) -> bool:
+    """
+    Record a failed run. The job goes back to pending after `retry_delay_seconds`,
+    or to dead if it has used up its attempts.
+    """
+    now = _now()
+    if job["attempts"] >= job.get("max_attempts", 5):
+        update = {"status": DEAD, "completed_at": now}
+    else:
+        update = {"status": PENDING, "run_at": now + timedelta(seconds=retry_delay_seconds)}
+    update["last_error"] = error
+
+    result = await jobs_collection.update_one(
+        {"_id": job["_id"], "status": LEASED, "lease_owner": worker_id},
+        {"$set": update, "$unset": {"lease_owner": ""}}
+    )
+    return result.modified_count > 0
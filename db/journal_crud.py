@@ -1,37 +1,100 @@
-from .database import journals_collection
+from typing import List, Optional
+
+from . import loaders, user_versions
+from .bulk import find_by_ids, insert_many_unordered
+from .database import journals_collection, raw, read_session, reads_for
+from .pagination import DEFAULT_PAGE_SIZE, build_page_filter, fetch_page
 from bson import ObjectId
+from pymongo import ReturnDocument
+
 
+# fields a caller may ask for in list views; "preview" is computed by mongo from content
+JOURNAL_FIELDS = {"title", "content", "date", "user_ID", "star_IDs", "keyphrase"}
+PREVIEW_CHARS = 120
 
 # helper to convert ObjectId to str
 def serialize_journal(journal) -> dict:
     journal["_id"] = str(journal["_id"])
     return journal
 
+
+loaders.register("journals", lambda journal_ids: find_by_ids(journals_collection, journal_ids, serialize_journal))
+
+
+def journal_projection(fields: Optional[List[str]], preview_chars: int = PREVIEW_CHARS) -> Optional[dict]:
+    """
+    Mongo projection for the requested journal fields (None = whole document).
+
+    "preview" is the first `preview_chars` characters of content, cut server-side so the
+    full body never leaves the database. Unknown field names are ignored; _id and date
+    are always returned.
+    """
+    if not fields:
+        return None
+    projection = {"date": 1}
+    for field in fields:
+        if field == "preview":
+            projection["preview"] = {"$substrCP": [{"$ifNull": ["$content", ""]}, 0, preview_chars]}
+        elif field in JOURNAL_FIELDS:
+            projection[field] = 1
+    return projection
+
 # CREATE
 async def create_journal(journal_data: dict):
-    result = await journals_collection.insert_one(journal_data)
-    journal = await journals_collection.find_one({"_id": result.inserted_id})
+    # insert_one fills in _id, so the inserted doc is the stored doc - no need to read it back
+    journal = dict(journal_data)
+    await journals_collection.insert_one(journal)
+    await user_versions.bump(journal.get("user_ID"))
     return serialize_journal(journal)
 
+async def create_journals(journal_list: List[dict]) -> List[dict]:
+    """Insert many journals in one round trip. Per-item results in input order (see db/bulk.py)."""
+    results = await insert_many_unordered(journals_collection, journal_list, serialize_journal)
+    await user_versions.bump(*{j.get("user_ID") for j in journal_list})
+    return results
+
 # READ
 async def get_journal_by_id(journal_id: str):
+    # batched and remembered within a request, see db/loaders.py
+    if loaders.get_loader("journals"):
+        return await loaders.load("journals", journal_id)
     journal = await journals_collection.find_one({"_id": ObjectId(journal_id)})
     if journal:
         return serialize_journal(journal)
     return None
 
+async def get_journal_owner(journal_id: str) -> Optional[str]:
+    """user_ID of a journal (never changes after creation), None if it doesn't exist."""
+    if not ObjectId.is_valid(journal_id):
+        return None
+    journal = await journals_collection.find_one({"_id": ObjectId(journal_id)}, {"user_ID": 1})
+    return journal.get("user_ID") if journal else None
+
+async def get_journals_by_ids(journal_ids: List[str], projection: Optional[dict] = None) -> List[dict]:
+    """Get many journals in one $in query, in the order of `journal_ids` (missing ones skipped)."""
+    if projection is None and loaders.get_loader("journals"):
+        return await loaders.load_many("journals", journal_ids)
+    return await find_by_ids(journals_collection, journal_ids, serialize_journal, projection)
+
 # UPDATE
 async def update_journal(journal_id: str, update_data: dict):
-    await journals_collection.update_one({"_id": ObjectId(journal_id)}, {"$set": update_data})
-    journal = await journals_collection.find_one({"_id": ObjectId(journal_id)})
+    journal = await journals_collection.find_one_and_update(
+        {"_id": ObjectId(journal_id)}, {"$set": update_data}, return_document=ReturnDocument.AFTER
+    )
+    loaders.forget("journals", journal_id)
     if journal:
+        await user_versions.bump(journal.get("user_ID"))
         return serialize_journal(journal)
     return None
 
 # DELETE
 async def delete_journal(journal_id: str):
-    result = await journals_collection.delete_one({"_id": ObjectId(journal_id)})
-    return result.deleted_count > 0
+    journal = await journals_collection.find_one_and_delete({"_id": ObjectId(journal_id)}, projection={"user_ID": 1})
+    loaders.forget("journals", journal_id)
+    if journal is None:
+        return False
+    await user_versions.bump(journal.get("user_ID"))
+    return True
 
 
 # STAR RELATIONSHIPS
@@ -40,14 +103,34 @@ async def add_stars_to_journal(journal_id: str, star_ids: list) -> dict:
     Add multiple star IDs to a journal's star_ids array.
     Uses $addToSet to avoid duplicates.
     """
-    await journals_collection.update_one(
+    journal = await journals_collection.find_one_and_update(
         {"_id": ObjectId(journal_id)},
-        {"$addToSet": {"star_ids": {"$each": star_ids}}}
+        {"$addToSet": {"star_ids": {"$each": star_ids}}},
+        return_document=ReturnDocument.AFTER
     )
-    journal = await journals_collection.find_one({"_id": ObjectId(journal_id)})
+    loaders.forget("journals", journal_id)
+    if journal:
+        await user_versions.bump(journal.get("user_ID"))
     return serialize_journal(journal) if journal else None
 
 
+async def link_journal_to_stars(journal_id: str, star_ids: list) -> bool:
+    """
+    Add star IDs to a journal's star_IDs array in one update (the journal side of
+    star_crud.link_star_to_journal, for many stars at once).
+    """
+    journal = await journals_collection.find_one_and_update(
+        {"_id": ObjectId(journal_id)},
+        {"$addToSet": {"star_IDs": {"$each": star_ids}}},
+        projection={"user_ID": 1}
+    )
+    loaders.forget("journals", journal_id)
+    if journal is None:
+        return False
+    await user_versions.bump(journal.get("user_ID"))
+    return True
+
+
 async def get_journals_by_star(star_id: str):
     """
     Get all journals that reference a specific star.
@@ -63,15 +146,38 @@ async def get_journal_stars(journal_id: str):
     """
     Get the list of star IDs associated with a journal.
     """
-    journal = await journals_collection.find_one({"_id": ObjectId(journal_id)})
+    journal = await get_journal_by_id(journal_id)
     if journal:
         return journal.get("star_IDs", [])
     return []
 
-async def get_user_journals(user_ID: str):
-    """Get all journals for a specific user."""
-    cursor = journals_collection.find({"user_ID": user_ID}).sort("date", -1)
+async def get_user_journals(user_ID: str, projection: Optional[dict] = None, serialize: bool = True):
+    """
+    Get all journals for a specific user, optionally only the fields in `projection`.
+    serialize=False leaves _id as an ObjectId, for callers that hand the list to api/fast_json.py.
+    """
+    cursor = reads_for("history", journals_collection).find({"user_ID": user_ID}, projection,
+                                                            session=read_session()).sort("date", -1)
+    if not serialize:
+        return [journal async for journal in cursor]
     journals = []
     async for journal in cursor:
         journals.append(serialize_journal(journal))
     return journals
+
+
+def stream_user_journals(user_ID: str, projection: Optional[dict] = None):
+    """
+    Same query as get_user_journals, as a cursor of RawBSONDocument (db/database.py raw read mode).
+    Nothing is fetched until it is iterated; nothing is decoded unless a field is read.
+    """
+    return raw(reads_for("history", journals_collection)).find({"user_ID": user_ID}, projection,
+                                                                session=read_session()).sort("date", -1)
+
+
+async def get_user_journals_page(user_ID: str, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None,
+                                 date_from: Optional[int] = None, date_to: Optional[int] = None,
+                                 projection: Optional[dict] = None) -> dict:
+    """Get one page of a user's journals, newest first. See db/pagination.py."""
+    query = build_page_filter(user_ID, cursor, date_from, date_to)
+    return await fetch_page(reads_for("history", journals_collection), query, limit, serialize_journal, projection)
@@ -0,0 +1,34 @@
+# Description: persistent tier of the ai_keywords cache (content hash -> extracted phrase)
+# Created on 2026-10-18
+import os
+from datetime import datetime, timezone
+from typing import Optional
+
+from db.database import keyword_cache_collection
+
+# how long a cached extraction lives before mongo's TTL monitor removes it
+KEYWORD_CACHE_TTL_SECONDS = int(os.getenv("KEYWORD_CACHE_TTL_DAYS", "30")) * 86400
+
+
+async def get_cached_keywords(content_hash: str) -> Optional[str]:
+    """Get the stored extraction for a content hash, or None if missing/expired."""
+    try:
+        doc = await keyword_cache_collection.find_one({"_id": content_hash}, {"result": 1})
+        return doc["result"] if doc else None
+    except Exception as e:
+        print(f"Error reading keyword cache: {e}")
+        return None
+
+
+async def save_cached_keywords(content_hash: str, result: str) -> bool:
+    """Store (or refresh) the extraction for a content hash."""
+    try:
+        await keyword_cache_collection.update_one(
+            {"_id": content_hash},
+            {"$set": {"result": result, "created_at": datetime.now(timezone.utc)}},
+            upsert=True
+        )
+        return True
+    except Exception as e:
+        print(f"Error writing keyword cache: {e}")
+        return False
@@ -0,0 +1,129 @@
+# Description: request-scoped batching + dedup for by-ID lookups (dataloader pattern).
+# inside a request scope, every get_*_by_id issued in the same event-loop tick becomes one $in query,
+# and each document is fetched at most once for the rest of the request.
+# Created on 2026-10-18
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Dict, List, Optional
+
+# kind ("stars", "journals", ...) -> function fetching a list of IDs in one query
+BatchFn = Callable[[List[str]], Awaitable[List[dict]]]
+_batch_fns: Dict[str, BatchFn] = {}
+
+# strong refs to in-flight dispatch tasks so they can't be garbage collected mid-query
+_dispatching = set()
+
+# loaders for the current request, None outside a request scope
+_scope: ContextVar[Optional[Dict[str, "BatchLoader"]]] = ContextVar("request_loaders", default=None)
+
+
+class BatchLoader:
+    """
+    Collects load(id) calls made in the same event-loop tick and resolves them with one batch query.
+
+    Results are remembered (including "not found") until the loader is discarded with its request.
+    Only for reads: code that writes a document must call forget() for it.
+    """
+
+    def __init__(self, batch_fn: BatchFn):
+        self.batch_fn = batch_fn
+        self._cache: Dict[str, asyncio.Future] = {}
+        self._queue: List[tuple] = []
+        self.loads = 0
+        self.batches = 0
+
+    def load(self, key: str) -> "asyncio.Future":
+        self.loads += 1
+        future = self._cache.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._cache[key] = future
+            self._queue.append((key, future))
+            if len(self._queue) == 1:
+                # run after everything else scheduled for this tick has had a chance to queue its keys
+                loop.call_soon(self._schedule_dispatch)
+        return future
+
+    async def load_many(self, keys: List[str]) -> List[Optional[dict]]:
+        return list(await asyncio.gather(*(self.load(k) for k in keys)))
+
+    def forget(self, *keys: str):
+        for key in keys:
+            self._cache.pop(key, None)
+
+    def _schedule_dispatch(self):
+        task = asyncio.ensure_future(self._dispatch())
+        _dispatching.add(task)
+        task.add_done_callback(_dispatching.discard)
+
+    async def _dispatch(self):
+        queue, self._queue = self._queue, []
+        self.batches += 1
+        try:
+            docs = await self.batch_fn(list(dict.fromkeys(key for key, _ in queue)))
+        except Exception as e:
+            for key, future in queue:
+                if self._cache.get(key) is future:
+                    del self._cache[key]
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        by_id = {doc["_id"]: doc for doc in docs}
+        for key, future in queue:
+            if not future.done():
+                future.set_result(by_id.get(key))
+
+
+def register(kind: str, batch_fn: BatchFn):
+    """Called by the crud modules at import time to make a kind of document loadable."""
+    _batch_fns[kind] = batch_fn
+
+
+def get_loader(kind: str) -> Optional[BatchLoader]:
+    """The current request's loader for `kind`, or None when not inside a request scope."""
+    loaders = _scope.get()
+    if loaders is None:
+        return None
+    loader = loaders.get(kind)
+    if loader is None:
+        loader = loaders[kind] = BatchLoader(_batch_fns[kind])
+    return loader
+
+
+async def load(kind: str, key: str) -> Optional[dict]:
+    """Load one document through the request loader. Returns a copy so callers can modify it freely."""
+    doc = await get_loader(kind).load(key)
+    return dict(doc) if doc is not None else None
+
+
+async def load_many(kind: str, keys: List[str]) -> List[dict]:
+    """Load many documents through the request loader, in order of `keys`, skipping ones not found."""
+    docs = await get_loader(kind).load_many(keys)
+    return [dict(doc) for doc in docs if doc is not None]
+
+
+def forget(kind: str, *keys: str):
+    """Drop cached documents after writing them, so later loads in this request see the change."""
+    loader = get_loader(kind)
+    if loader is not None:
+        loader.forget(*keys)
+
+
+def forget_all(kind: str):
+    """Drop every cached document of a kind (for writes that touch documents we can't list)."""
+    loaders = _scope.get()
+    if loaders is not None:
+        loaders.pop(kind, None)
+
+
+@contextmanager
+def request_scope():
+    """Give the code inside (one HTTP request, one background job) its own set of loaders."""
+    token = _scope.set({})
+    try:
+        yield
+    finally:
+        _scope.reset(token)
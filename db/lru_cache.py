@@ -0,0 +1,78 @@
+# Description: small in-process LRU cache bounded by item count and approximate byte size.
+# Created on 2026-10-18
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+def approx_size(value: Any) -> int:
+    """Rough in-memory footprint of a cached value, good enough for eviction decisions."""
+    return len(str(value))
+
+
+class LRUCache:
+    """
+    Least-recently-used cache with hit/miss counters.
+
+    Evicts the oldest entries once either `max_items` or `max_bytes` is exceeded.
+    Not thread-safe; meant for use from a single asyncio event loop.
+    """
+
+    def __init__(self, max_items: int, max_bytes: int, sizeof: Callable[[Any], int] = approx_size):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value (marking it recently used), or None on a miss."""
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return item[0]
+
+    def set(self, key: Hashable, value: Any):
+        self.pop(key)
+        size = self.sizeof(value)
+        if size > self.max_bytes:
+            return
+        self._data[key] = (value, size)
+        self.bytes += size
+        while len(self._data) > self.max_items or self.bytes > self.max_bytes:
+            _, (_, old_size) = self._data.popitem(last=False)
+            self.bytes -= old_size
+            self.evictions += 1
+
+    def pop(self, key: Hashable) -> Optional[Any]:
+        item = self._data.pop(key, None)
+        if item is None:
+            return None
+        self.bytes -= item[1]
+        return item[0]
+
+    def clear(self):
+        self._data.clear()
+        self.bytes = 0
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "items": len(self._data),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
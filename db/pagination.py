@@ -0,0 +1,74 @@
+# Description: keyset (cursor) pagination over a user's entries, newest first.
+# pages walk the (user_ID, date, _id) index, so every page costs the same no matter how deep it is.
+# Created on 2026-10-18
+import base64
+import json
+from typing import Callable, Optional
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(doc: dict) -> str:
+    """Opaque cursor pointing just after `doc` in (date desc, _id desc) order."""
+    raw = json.dumps({"d": doc["date"], "i": str(doc["_id"])}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """Inverse of encode_cursor. Raises ValueError for anything that isn't one of our cursors."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        return data["d"], ObjectId(data["i"])
+    except (ValueError, KeyError, TypeError, InvalidId):
+        raise ValueError("invalid cursor")
+
+
+def build_page_filter(user_ID: str, cursor: Optional[str] = None,
+                      date_from: Optional[int] = None, date_to: Optional[int] = None) -> dict:
+    """
+    Mongo filter for one page of a user's entries.
+
+    Args:
+        user_ID: Whose entries
+        cursor: next_cursor from the previous page, None for the first page
+        date_from: Only entries with date >= this unix timestamp
+        date_to: Only entries with date <= this unix timestamp
+    """
+    query = {"user_ID": user_ID}
+
+    date_range = {}
+    if date_from is not None:
+        date_range["$gte"] = date_from
+    if date_to is not None:
+        date_range["$lte"] = date_to
+    if date_range:
+        query["date"] = date_range
+
+    if cursor:
+        last_date, last_id = decode_cursor(cursor)
+        query["$or"] = [
+            {"date": {"$lt": last_date}},
+            {"date": last_date, "_id": {"$lt": last_id}},
+        ]
+    return query
+
+
+async def fetch_page(collection, query: dict, limit: int, serialize: Callable[[dict], dict],
+                     projection: Optional[dict] = None) -> dict:
+    """
+    Run a page query newest-first. A projection must keep `date` (the cursor needs it).
+
+    Returns:
+        {"items": [...], "next_cursor": str or None when this is the last page}
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    cursor = collection.find(query, projection).sort([("date", -1), ("_id", -1)]).limit(limit + 1)
+    docs = await cursor.to_list(length=limit + 1)
+
+    next_cursor = encode_cursor(docs[limit - 1]) if len(docs) > limit else None
+    return {"items": [serialize(doc) for doc in docs[:limit]], "next_cursor": next_cursor}
@@ -1,5 +1,7 @@
 # Description: overall file to save every type of data
 # Created by Emilia on 2026-01-31
+from typing import List
+
 from entities.constellation import Constellation
 from entities.quiz import QuizEntry
 from entities.journal import JournalEntry
@@ -20,7 +22,12 @@ async def save_quiz(quiz_data: QuizEntry) -> dict:
     #   "date": 1706668800
     # }
 
-    quiz_dict = {
+    created_quiz = await quiz_crud.create_quiz_entry(quiz_to_document(quiz_data))
+    return created_quiz
+
+
+def quiz_to_document(quiz_data: QuizEntry) -> dict:
+    return {
         "quiz": dict(quiz_data.quiz),
         "user_ID": quiz_data.user_ID,
         "yesterday_goal": 1 if quiz_data.yesterday_goal else 0,
@@ -28,8 +35,10 @@ async def save_quiz(quiz_data: QuizEntry) -> dict:
         "date": quiz_data.date,
     }
 
-    created_quiz = await quiz_crud.create_quiz_entry(quiz_dict)
-    return created_quiz
+
+async def save_quizzes(quiz_list: List[QuizEntry]) -> List[dict]:
+    """Persist many QuizEntry entities with a single insert_many. Per-item results in input order."""
+    return await quiz_crud.create_quiz_entries([quiz_to_document(q) for q in quiz_list])
 
 
 async def save_journal(journal_data: JournalEntry) -> dict:
@@ -43,15 +52,22 @@ async def save_journal(journal_data: JournalEntry) -> dict:
     #   "date": 1706668800
     # }
 
-    journal_dict = {
+    created_journal = await journal_crud.create_journal(journal_to_document(journal_data))
+    return created_journal
+
+
+def journal_to_document(journal_data: JournalEntry) -> dict:
+    return {
         "title": getattr(journal_data, "title", None),
         "content": journal_data.content,
         "user_ID": journal_data.user_ID,
         "date": int(journal_data.date)
     }
 
-    created_journal = await journal_crud.create_journal(journal_dict)
-    return created_journal
+
+async def save_journals(journal_list: List[JournalEntry]) -> List[dict]:
+    """Persist many JournalEntry entities with a single insert_many. Per-item results in input order."""
+    return await journal_crud.create_journals([journal_to_document(j) for j in journal_list])
 
 async def save_star(star_data: Star) -> dict:
     """Convert a Star domain entity into the MongoDB document format and persist it."""
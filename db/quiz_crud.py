@@ -1,17 +1,83 @@
-from .database import quiz_entries_collection
+from typing import List, Optional
+
+from . import user_versions
+from .bulk import insert_many_unordered
+from .database import quiz_entries_collection, raw, read_session, reads_for
+from .pagination import DEFAULT_PAGE_SIZE, build_page_filter, fetch_page
+from .quiz_rollup_crud import add_quizzes_to_rollups, remove_quiz_from_rollups
 from bson import ObjectId
+from pymongo import ReturnDocument
+
+# fields a caller may ask for in list views
+QUIZ_FIELDS = {"quiz", "yesterday_goal", "tomorrow", "date", "user_ID"}
+# fields the per-user rollups (db/quiz_rollup_crud.py) are computed from
+ROLLUP_FIELDS = {"quiz", "yesterday_goal", "date", "user_ID"}
 
 # helper to convert ObjectId to str
 def serialize_quiz_entry(entry) -> dict:
     entry["_id"] = str(entry["_id"])
     return entry
 
+
+def quiz_projection(fields: Optional[List[str]]) -> Optional[dict]:
+    """Mongo projection for the requested quiz fields (None = whole document). _id and date are always returned."""
+    if not fields:
+        return None
+    projection = {"date": 1}
+    for field in fields:
+        if field in QUIZ_FIELDS:
+            projection[field] = 1
+    return projection
+
+
+async def _update_rollups(removed: Optional[List[dict]] = None, added: Optional[List[dict]] = None):
+    """
+    Keep the rollups in step with a quiz write. The quiz write has already succeeded, so a
+    rollup failure is only logged; `python -m db.quiz_rollup_crud <user_ID>` rebuilds them.
+    """
+    removed, added = removed or [], added or []
+    try:
+        for entry in removed:
+            await remove_quiz_from_rollups(entry)
+        await add_quizzes_to_rollups(added)
+    except Exception as e:
+        users = {entry.get("user_ID") for entry in removed + added}
+        print(f"Error updating quiz rollups for {users}: {e}")
+
+
+def _touches_rollups(update_data: dict) -> bool:
+    return any(key.split(".")[0] in ROLLUP_FIELDS for key in update_data)
+
+
+def _apply_set(entry: dict, update_data: dict) -> dict:
+    """The document as it is after {"$set": update_data} (dotted keys set nested fields)."""
+    entry = dict(entry)
+    for key, value in update_data.items():
+        target, *path = key.split(".")
+        if not path:
+            entry[key] = value
+            continue
+        node = entry[target] = dict(entry.get(target) or {})
+        for part in path[:-1]:
+            node = node[part] = dict(node.get(part) or {})
+        node[path[-1]] = value
+    return entry
+
 # CREATE
 async def create_quiz_entry(entry_data: dict):
-    result = await quiz_entries_collection.insert_one(entry_data)
-    entry = await quiz_entries_collection.find_one({"_id": result.inserted_id})
+    entry = dict(entry_data)
+    await quiz_entries_collection.insert_one(entry)
+    await _update_rollups(added=[entry])
+    await user_versions.bump(entry.get("user_ID"))
     return serialize_quiz_entry(entry)
 
+async def create_quiz_entries(entry_list: List[dict]) -> List[dict]:
+    """Insert many quiz entries in one round trip. Per-item results in input order (see db/bulk.py)."""
+    results = await insert_many_unordered(quiz_entries_collection, entry_list, serialize_quiz_entry)
+    await _update_rollups(added=[r["doc"] for r in results if r["status"] == "success"])
+    await user_versions.bump(*{entry.get("user_ID") for entry in entry_list})
+    return results
+
 # READ
 async def get_quiz_entry_by_id(entry_id: str):
     entry = await quiz_entries_collection.find_one({"_id": ObjectId(entry_id)})
@@ -19,23 +85,66 @@ async def get_quiz_entry_by_id(entry_id: str):
         return serialize_quiz_entry(entry)
     return None
 
+async def get_quiz_entry_owner(entry_id: str) -> Optional[str]:
+    """user_ID of a quiz entry (never changes after creation), None if it doesn't exist."""
+    if not ObjectId.is_valid(entry_id):
+        return None
+    entry = await quiz_entries_collection.find_one({"_id": ObjectId(entry_id)}, {"user_ID": 1})
+    return entry.get("user_ID") if entry else None
+
 # UPDATE
 async def update_quiz_entry(entry_id: str, update_data: dict):
-    await quiz_entries_collection.update_one({"_id": ObjectId(entry_id)}, {"$set": update_data})
-    entry = await quiz_entries_collection.find_one({"_id": ObjectId(entry_id)})
-    if entry:
-        return serialize_quiz_entry(entry)
-    return None
+    # the old version is needed to take it back out of the rollups; the new one is derived from it
+    before = await quiz_entries_collection.find_one_and_update(
+        {"_id": ObjectId(entry_id)}, {"$set": update_data}, return_document=ReturnDocument.BEFORE
+    )
+    if not before:
+        return None
+    entry = _apply_set(before, update_data)
+    if _touches_rollups(update_data):
+        await _update_rollups(removed=[before], added=[entry])
+    await user_versions.bump(before.get("user_ID"), entry.get("user_ID"))
+    return serialize_quiz_entry(entry)
 
 # DELETE
 async def delete_quiz_entry(entry_id: str):
-    result = await quiz_entries_collection.delete_one({"_id": ObjectId(entry_id)})
-    return result.deleted_count > 0
+    entry = await quiz_entries_collection.find_one_and_delete(
+        {"_id": ObjectId(entry_id)}, projection={field: 1 for field in ROLLUP_FIELDS}
+    )
+    if entry is None:
+        return False
+    await _update_rollups(removed=[entry])
+    await user_versions.bump(entry.get("user_ID"))
+    return True
 
-async def get_user_quiz_entries(user_ID: str):
-    """Get all quiz entries for a specific user."""
-    cursor = quiz_entries_collection.find({"user_ID": user_ID}).sort("date", -1)
+async def get_user_quiz_entries(user_ID: str, projection: Optional[dict] = None, serialize: bool = True):
+    """
+    Get all quiz entries for a specific user, optionally only the fields in `projection`.
+    serialize=False leaves _id as an ObjectId, for callers that hand the list to api/fast_json.py.
+    """
+    cursor = reads_for("history", quiz_entries_collection).find({"user_ID": user_ID}, projection,
+                                                                session=read_session()).sort("date", -1)
+    if not serialize:
+        return [entry async for entry in cursor]
     quiz_entries = []
     async for entry in cursor:
         quiz_entries.append(serialize_quiz_entry(entry))
     return quiz_entries
+
+
+def stream_user_quiz_entries(user_ID: str, projection: Optional[dict] = None):
+    """
+    Same query as get_user_quiz_entries, as a cursor of RawBSONDocument (db/database.py raw read mode).
+    Nothing is fetched until it is iterated; nothing is decoded unless a field is read.
+    """
+    return raw(reads_for("history", quiz_entries_collection)).find({"user_ID": user_ID}, projection,
+                                                                    session=read_session()).sort("date", -1)
+
+
+async def get_user_quiz_entries_page(user_ID: str, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None,
+                                     date_from: Optional[int] = None, date_to: Optional[int] = None,
+                                     projection: Optional[dict] = None) -> dict:
+    """Get one page of a user's quiz entries, newest first. See db/pagination.py."""
+    query = build_page_filter(user_ID, cursor, date_from, date_to)
+    return await fetch_page(reads_for("history", quiz_entries_collection), query, limit, serialize_quiz_entry,
+                            projection)
@@ -0,0 +1,221 @@
+# Description: materialized per-user quiz rollups - one document per user per day / per week holding
+# count, sum, min and max for every metric, kept up to date by quiz_crud on every insert, update and delete.
+# dashboards read a handful of rollup documents instead of scanning the user's whole quiz history.
+#
+#   python -m db.quiz_rollup_crud                 (rebuild every user's rollups from the quiz collection)
+#   python -m db.quiz_rollup_crud <user_ID> ...   (rebuild only these users)
+# Created on 2026-10-18
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional
+
+from pymongo import ReturnDocument, UpdateOne
+
+from db.database import quiz_entries_collection, quiz_rollups_collection, reads_for
+
+# buckets are UTC calendar days and ISO weeks (starting Monday)
+PERIODS = ("day", "week")
+
+
+def _number(value) -> Optional[float]:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    return value
+
+
+def _metrics(quiz: dict) -> Dict[str, float]:
+    """The numeric metrics of a check-in whose names are safe to use as field names."""
+    return {
+        name: value
+        for name, value in ((name, _number(v)) for name, v in (quiz.get("quiz") or {}).items())
+        if value is not None and isinstance(name, str) and name and "." not in name and not name.startswith("$")
+    }
+
+
+def bucket_starts(date) -> Optional[Dict[str, int]]:
+    """{"day": unix start of the UTC day, "week": unix start of the ISO week} for a unix timestamp."""
+    try:
+        dt = datetime.fromtimestamp(int(date), tz=timezone.utc)
+    except (TypeError, ValueError, OverflowError, OSError):
+        return None
+    day = dt.replace(hour=0, minute=0, second=0, microsecond=0)
+    week = day - timedelta(days=day.weekday())
+    return {"day": int(day.timestamp()), "week": int(week.timestamp())}
+
+
+def _bucket_end(period: str, start: int) -> int:
+    return start + (86400 if period == "day" else 7 * 86400)
+
+
+def rollup_id(user_ID: str, period: str, start: int) -> str:
+    return f"{user_ID}:{period}:{start}"
+
+
+def _add_ops(quiz: dict) -> List[UpdateOne]:
+    """Upserts adding one check-in to its day and week buckets."""
+    starts = bucket_starts(quiz.get("date"))
+    if starts is None or not quiz.get("user_ID"):
+        return []
+
+    inc = {"count": 1, "goals_met": 1 if quiz.get("yesterday_goal") else 0}
+    low, high = {}, {}
+    for name, value in _metrics(quiz).items():
+        inc[f"metrics.{name}.count"] = 1
+        inc[f"metrics.{name}.sum"] = value
+        low[f"metrics.{name}.min"] = value
+        high[f"metrics.{name}.max"] = value
+
+    ops = []
+    for period, start in starts.items():
+        update = {"$inc": inc, "$setOnInsert": {"user_ID": quiz["user_ID"], "period": period, "start": start}}
+        if low:
+            update["$min"] = low
+            update["$max"] = high
+        ops.append(UpdateOne({"_id": rollup_id(quiz["user_ID"], period, start)}, update, upsert=True))
+    return ops
+
+
+async def add_quizzes_to_rollups(quizzes: List[dict]):
+    """Add check-ins to their rollups with one unordered bulk write of $inc / $min / $max upserts."""
+    ops = [op for quiz in quizzes for op in _add_ops(quiz)]
+    if ops:
+        await quiz_rollups_collection.bulk_write(ops, ordered=False)
+
+
+async def _recompute_extremes(user_ID: str, period: str, start: int, names: Iterable[str]) -> dict:
+    """
+    min / max of the given metrics over the check-ins still in a bucket (an index range scan on user_ID, date).
+    Only numeric values count, the same as _metrics() when the bucket was built.
+    """
+    group = {"_id": None}
+    for name in names:
+        # non-numeric answers become null, which $min / $max skip (a string would sort above every number)
+        value = {"$cond": [{"$isNumber": f"$quiz.{name}"}, f"$quiz.{name}", None]}
+        group[f"{name}__min"] = {"$min": value}
+        group[f"{name}__max"] = {"$max": value}
+    cursor = quiz_entries_collection.aggregate([
+        {"$match": {"user_ID": user_ID, "date": {"$gte": start, "$lt": _bucket_end(period, start)}}},
+        {"$group": group},
+    ])
+    result = {}
+    async for row in cursor:
+        for name in names:
+            result[f"metrics.{name}.min"] = row[f"{name}__min"]
+            result[f"metrics.{name}.max"] = row[f"{name}__max"]
+    return result
+
+
+async def remove_quiz_from_rollups(quiz: dict):
+    """
+    Take a deleted (or pre-update) check-in back out of its day and week buckets.
+
+    count and sum are decremented atomically. min / max can't be un-applied, so they are
+    recomputed from the bucket's remaining check-ins, but only when the removed value was
+    the bucket's min or max. Buckets left empty are deleted.
+    """
+    starts = bucket_starts(quiz.get("date"))
+    if starts is None or not quiz.get("user_ID"):
+        return
+
+    metrics = _metrics(quiz)
+    inc = {"count": -1, "goals_met": -1 if quiz.get("yesterday_goal") else 0}
+    for name, value in metrics.items():
+        inc[f"metrics.{name}.count"] = -1
+        inc[f"metrics.{name}.sum"] = -value
+
+    for period, start in starts.items():
+        _id = rollup_id(quiz["user_ID"], period, start)
+        rollup = await quiz_rollups_collection.find_one_and_update(
+            {"_id": _id}, {"$inc": inc}, return_document=ReturnDocument.AFTER
+        )
+        if rollup is None:
+            continue
+        if rollup["count"] <= 0:
+            await quiz_rollups_collection.delete_one({"_id": _id, "count": {"$lte": 0}})
+            continue
+
+        emptied, stale = [], []
+        for name, value in metrics.items():
+            stats = rollup.get("metrics", {}).get(name, {})
+            if stats.get("count", 0) <= 0:
+                emptied.append(name)
+            elif value <= stats.get("min", value) or value >= stats.get("max", value):
+                stale.append(name)
+
+        update = {}
+        if emptied:
+            update["$unset"] = {f"metrics.{name}": "" for name in emptied}
+        if stale:
+            update["$set"] = await _recompute_extremes(quiz["user_ID"], period, start, stale)
+        if update:
+            await quiz_rollups_collection.update_one({"_id": _id}, update)
+
+
+async def rebuild_quiz_rollups(user_ID: str) -> int:
+    """
+    Throw away a user's rollups and recompute them from their quiz history
+    (backfill for data saved before rollups existed, or repair after a failed rollup write).
+
+    Returns:
+        Number of rollup documents written
+    """
+    await quiz_rollups_collection.delete_many({"user_ID": user_ID})
+    ops = []
+    async for quiz in quiz_entries_collection.find({"user_ID": user_ID}, {"user_ID": 1, "date": 1, "quiz": 1,
+                                                                         "yesterday_goal": 1}):
+        ops.extend(_add_ops(quiz))
+    if not ops:
+        return 0
+    result = await quiz_rollups_collection.bulk_write(ops, ordered=False)
+    return result.upserted_count
+
+
+def serialize_rollup(rollup: dict) -> dict:
+    """Add the derived averages (metric mean, goal completion rate) to a rollup document."""
+    count = rollup.get("count", 0)
+    rollup["goal_rate"] = round(rollup.get("goals_met", 0) / count, 3) if count else None
+    for stats in rollup.get("metrics", {}).values():
+        stats["mean"] = round(stats["sum"] / stats["count"], 2) if stats.get("count") else None
+    return rollup
+
+
+async def get_quiz_rollups(user_ID: str, period: str = "week", date_from: Optional[int] = None,
+                           date_to: Optional[int] = None) -> List[dict]:
+    """
+    Get a user's rollups for one period size, oldest first.
+
+    Args:
+        user_ID: The user
+        period: "day" or "week"
+        date_from: Only buckets starting at or after this unix time (optional)
+        date_to: Only buckets starting at or before this unix time (optional)
+
+    Returns:
+        Rollup documents: {"_id", "user_ID", "period", "start", "count", "goals_met", "goal_rate",
+                           "metrics": {name: {"count", "sum", "min", "max", "mean"}}}
+    """
+    if period not in PERIODS:
+        raise ValueError(f"period must be one of {', '.join(PERIODS)}")
+
+    query = {"user_ID": user_ID, "period": period}
+    if date_from is not None or date_to is not None:
+        query["start"] = {}
+        if date_from is not None:
+            query["start"]["$gte"] = int(date_from)
+        if date_to is not None:
+            query["start"]["$lte"] = int(date_to)
+
+    cursor = reads_for("analytics", quiz_rollups_collection).find(query).sort("start", 1)
+    return [serialize_rollup(rollup) async for rollup in cursor]
+
+
+if __name__ == "__main__":
+    import asyncio
+    import sys
+
+    async def main():
+        user_IDs = sys.argv[1:] or await quiz_entries_collection.distinct("user_ID")
+        for user_ID in user_IDs:
+            written = await rebuild_quiz_rollups(user_ID)
+            print(f"✓ {user_ID}: {written} rollups")
+
+    asyncio.run(main())
@@ -2,63 +2,86 @@
 # Created on 2026-01-31
 
 from db.database import (
+    db,
     users_collection,
     journals_collection,
     stars_collection,
     quiz_entries_collection,
-    constellations_collection
+    quiz_rollups_collection,
+    constellations_collection,
+    keyword_cache_collection,
+    jobs_collection
 )
-
-
-async def create_indexes():
+from db.keyword_cache_crud import KEYWORD_CACHE_TTL_SECONDS
+
+# collection name -> [(keys, create_index options)]
+# every query shape in db/*_crud.py should be served by one of these; db/audit_query_plans.py checks it.
+INDEX_SPECS = {
+    users_collection.name: [
+        ([("email", 1)], {"unique": True}),
+    ],
+    journals_collection.name: [
+        ([("user_ID", 1)], {}),
+        ([("user_ID", 1), ("date", -1), ("_id", -1)], {}),  # keyset pages
+        ([("star_IDs", 1)], {}),  # journals for a star / unlinking a deleted star
+    ],
+    stars_collection.name: [
+        ([("user_ID", 1), ("name", 1)], {"unique": True}),
+        ([("user_ID", 1), ("constellation_ID", 1)], {}),
+        ([("user_ID", 1), ("journal_IDs", 1)], {}),  # Scoped to user
+        ([("constellation_ID", 1)], {}),  # any user's stars in a constellation (delete check)
+    ],
+    # global: "Mathematics", "Programming", etc.
+    constellations_collection.name: [
+        ([("name", 1)], {"unique": True}),
+    ],
+    quiz_entries_collection.name: [
+        ([("user_ID", 1)], {}),
+        ([("user_ID", 1), ("date", -1), ("_id", -1)], {}),  # keyset pages
+    ],
+    # a user's day / week buckets in date order (db/quiz_rollup_crud.py get_quiz_rollups)
+    quiz_rollups_collection.name: [
+        ([("user_ID", 1), ("period", 1), ("start", 1)], {}),
+    ],
+    # documents expire on their own
+    keyword_cache_collection.name: [
+        ([("created_at", 1)], {"expireAfterSeconds": KEYWORD_CACHE_TTL_SECONDS}),
+    ],
+    # runnable-job lookups, then finished jobs expire after a week
+    jobs_collection.name: [
+        ([("status", 1), ("run_at", 1)], {}),
+        ([("completed_at", 1)], {"expireAfterSeconds": 7 * 86400}),
+    ],
+}
+
+
+async def create_indexes(database=db):
     """
     Create all necessary indexes for the database collections.
 
-    This should be run once during application initialization or deployment.
-    Indexes improve query performance for common lookup patterns.
+    Issues every create_index unconditionally; the server uses db/index_migrations.ensure_indexes,
+    which only touches collections whose spec changed. Indexes improve query performance for
+    common lookup patterns.
     """
     print("Creating database indexes...")
 
-    # Users collection
-    await users_collection.create_index("email", unique=True)
-    print("✓ Users indexes created")
-
-    # Journals collection
-    await journals_collection.create_index("user_ID")
-    await journals_collection.create_index([("user_ID", 1), ("date", -1)])
-    await journals_collection.create_index([("user_ID", 1), ("star_ids", 1)])  # Scoped to user
-    print("✓ Journals indexes created")
-
-    # Stars collection
-    await stars_collection.create_index([("user_ID", 1), ("name", 1)], unique=True)
-    await stars_collection.create_index([("user_ID", 1), ("constellation_ID", 1)])
-    await stars_collection.create_index([("user_ID", 1), ("journal_IDs", 1)])  # Scoped to user
-    print("✓ Stars indexes created")
-
-    # Constellations collection (global)
-    await constellations_collection.create_index("name", unique=True)  # "Mathematics", "Programming", etc.
-    print("✓ Constellations indexes created")
-
-    # Quiz collection
-    await quiz_entries_collection.create_index("user_ID")
-    await quiz_entries_collection.create_index([("user_ID", 1), ("date", -1)])
-    print("✓ Quiz indexes created")
+    for collection_name, indexes in INDEX_SPECS.items():
+        for keys, options in indexes:
+            await database[collection_name].create_index(keys, **options)
+        print(f"✓ {collection_name} indexes created")
 
     print("All indexes created successfully!")
 
 
-async def drop_all_indexes():
+async def drop_all_indexes(database=db):
     """
     Drop all custom indexes (useful for testing or rebuilding).
     Note: This will not drop the default _id index.
     """
     print("Dropping all custom indexes...")
 
-    await users_collection.drop_indexes()
-    await journals_collection.drop_indexes()
-    await stars_collection.drop_indexes()
-    await constellations_collection.drop_indexes()
-    await quiz_entries_collection.drop_indexes()
+    for collection_name in INDEX_SPECS:
+        await database[collection_name].drop_indexes()
 
     print("All custom indexes dropped!")
 
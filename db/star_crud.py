@@ -1,9 +1,13 @@
 # Description: CRUD operations for Stars (topics)
 # Created on 2026-01-31
 from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
 
-from db.database import journals_collection, stars_collection
-from typing import List, Optional
+from db import loaders, user_versions
+from db.bulk import find_by_ids
+from db.database import journals_collection, read_session, reads_for, stars_collection
+from typing import Any, Dict, List, Optional
 from datetime import datetime
 
 
@@ -14,20 +18,41 @@ def serialize_star(star) -> dict:
     return star
 
 
+loaders.register("stars", lambda star_ids: find_by_ids(stars_collection, star_ids, serialize_star))
+
+
 # CREATE
 async def create_star(star_data: dict) -> dict:
-    result = await stars_collection.insert_one(star_data)
-    star = await stars_collection.find_one({"_id": result.inserted_id})
+    star = dict(star_data)
+    await stars_collection.insert_one(star)
+    await user_versions.bump(star.get("user_ID"))
     return serialize_star(star)
 
 
 # READ
 async def get_star_by_id(star_id: str) -> Optional[dict]:
-    """Get a star by its ID."""
+    """Get a star by its ID (batched and remembered within a request, see db/loaders.py)."""
+    if loaders.get_loader("stars"):
+        return await loaders.load("stars", star_id)
     star = await stars_collection.find_one({"_id": ObjectId(star_id)})
     return serialize_star(star) if star else None
 
 
+async def get_stars_by_ids(star_ids: List[str]) -> List[dict]:
+    """
+    Get many stars with a single $in query.
+
+    Args:
+        star_ids: Star IDs to fetch
+
+    Returns:
+        Star documents in the order of `star_ids` (missing or malformed IDs skipped)
+    """
+    if loaders.get_loader("stars"):
+        return await loaders.load_many("stars", star_ids)
+    return await find_by_ids(stars_collection, star_ids, serialize_star)
+
+
 async def get_star_by_name(user_ID: str, name: str) -> Optional[dict]:
     """
     Find a star by user ID and normalized name.
@@ -69,7 +94,7 @@ async def get_stars_by_constellation(user_ID: str, constellation_id: str) -> Lis
 
 async def get_all_user_stars(user_ID: str) -> List[dict]:
     """Get all stars for a specific user."""
-    cursor = stars_collection.find({"user_ID": user_ID})
+    cursor = reads_for("history", stars_collection).find({"user_ID": user_ID}, session=read_session())
     stars = []
     async for star in cursor:
         stars.append(serialize_star(star))
@@ -86,12 +111,99 @@ async def get_journals_for_star(star_id: str) -> List[str]:
     Returns:
         List of journal IDs
     """
-    star = await stars_collection.find_one({"_id": ObjectId(star_id)})
+    star = await get_star_by_id(star_id)
     if star:
         return star.get("journal_IDs", [])
     return []
 
 
+async def _bulk_write_retrying_duplicates(ops: List[UpdateOne]) -> Dict[int, Any]:
+    """
+    Run upserts unordered. Upserts that lose an insert race on the unique (user_ID, name)
+    index fail with a duplicate key error; running them again matches the winner's document.
+
+    Returns:
+        {op index: _id} for every op that inserted a new document
+    """
+    try:
+        result = await stars_collection.bulk_write(ops, ordered=False)
+        return dict(result.upserted_ids)
+    except BulkWriteError as e:
+        upserted = {u["index"]: u["_id"] for u in e.details.get("upserted", [])}
+        errors = e.details.get("writeErrors", [])
+        if any(err.get("code") != 11000 for err in errors):
+            raise
+        await stars_collection.bulk_write([ops[err["index"]] for err in errors], ordered=False)
+        return upserted
+
+
+async def upsert_journal_stars(user_ID: str, journal_id: str, topics: List[dict]) -> List[dict]:
+    """
+    Create-or-update the stars for a journal's topics and link the journal to them, in bulk.
+
+    One $in read finds the stars that already exist, then a single unordered bulk_write
+    upserts every topic by (user_ID, name) and adds journal_id to its journal_IDs. New stars get
+    their _id assigned here, so the returned documents are built from those two calls without
+    reading anything back (except for stars another save created between the two).
+
+    Args:
+        user_ID: The user who owns the stars
+        journal_id: The journal to link
+        topics: [{"name": str, "constellation_ID": str, "move": bool}], names unique.
+            `move` re-files an existing star under constellation_ID.
+
+    Returns:
+        The linked star documents, in the order of `topics`
+    """
+    if not topics:
+        return []
+
+    names = [t["name"] for t in topics]
+    existing = {}
+    async for star in stars_collection.find({"user_ID": user_ID, "name": {"$in": names}}):
+        existing[star["name"]] = serialize_star(star)
+
+    ops, new_ids, moved = [], {}, set()
+    for topic in topics:
+        name, constellation_id = topic["name"], topic["constellation_ID"]
+        update = {"$addToSet": {"journal_IDs": journal_id}}
+        star = existing.get(name)
+        if star is None:
+            new_ids[name] = ObjectId()
+            update["$setOnInsert"] = {"_id": new_ids[name], "constellation_ID": constellation_id}
+        elif topic.get("move") and star.get("constellation_ID") != constellation_id:
+            update["$set"] = {"constellation_ID": constellation_id}
+            moved.add(name)
+        ops.append(UpdateOne({"user_ID": user_ID, "name": name}, update, upsert=True))
+
+    upserted = await _bulk_write_retrying_duplicates(ops)
+
+    stars, raced = [], []
+    for i, topic in enumerate(topics):
+        name, constellation_id = topic["name"], topic["constellation_ID"]
+        star = existing.get(name)
+        if star is not None:
+            if journal_id not in star.get("journal_IDs", []):
+                star["journal_IDs"] = star.get("journal_IDs", []) + [journal_id]
+            if name in moved:
+                star["constellation_ID"] = constellation_id
+        elif i in upserted:
+            star = {"_id": str(new_ids[name]), "user_ID": user_ID, "name": name,
+                    "constellation_ID": constellation_id, "journal_IDs": [journal_id]}
+        else:
+            # someone else created this star between our read and our write
+            raced.append(name)
+        stars.append(star)
+
+    if raced:
+        async for star in stars_collection.find({"user_ID": user_ID, "name": {"$in": raced}}):
+            stars[names.index(star["name"])] = serialize_star(star)
+
+    loaders.forget("stars", *[s["_id"] for s in stars if s])
+    await user_versions.bump(user_ID)
+    return [s for s in stars if s]
+
+
 # UPDATE
 async def link_star_to_journal(star_id: str, journal_id: str) -> bool:
     """
@@ -109,9 +221,10 @@ async def link_star_to_journal(star_id: str, journal_id: str) -> bool:
     """
     try:
         # Add journal_id to star's journal_ids array (if not already present)
-        await stars_collection.update_one(
+        star = await stars_collection.find_one_and_update(
             {"_id": ObjectId(star_id)},
-            {"$addToSet": {"journal_IDs": journal_id}}
+            {"$addToSet": {"journal_IDs": journal_id}},
+            projection={"user_ID": 1}
         )
 
         # Add star_id to journal's star_ids array (if not already present)
@@ -120,6 +233,9 @@ async def link_star_to_journal(star_id: str, journal_id: str) -> bool:
             {"$addToSet": {"star_IDs": star_id}}
         )
 
+        loaders.forget("stars", star_id)
+        loaders.forget("journals", journal_id)
+        await user_versions.bump(star.get("user_ID") if star else None)
         return True
     except Exception as e:
         print(f"Error linking star to journal: {e}")
@@ -139,9 +255,10 @@ async def unlink_star_from_journal(star_id: str, journal_id: str) -> bool:
     """
     try:
         # Remove journal_id from star's journal_ids array
-        await stars_collection.update_one(
+        star = await stars_collection.find_one_and_update(
             {"_id": ObjectId(star_id)},
-            {"$pull": {"journal_IDs": journal_id}}
+            {"$pull": {"journal_IDs": journal_id}},
+            projection={"user_ID": 1}
         )
 
         # Remove star_id from journal's star_ids array
@@ -150,6 +267,9 @@ async def unlink_star_from_journal(star_id: str, journal_id: str) -> bool:
             {"$pull": {"star_IDs": star_id}}
         )
 
+        loaders.forget("stars", star_id)
+        loaders.forget("journals", journal_id)
+        await user_versions.bump(star.get("user_ID") if star else None)
         return True
     except Exception as e:
         print(f"Error unlinking star from journal: {e}")
@@ -165,17 +285,17 @@ async def update_star_constellation(star_id: str, new_constellation_id: str) ->
         new_constellation_id: The new constellation ID
 
     Returns:
-        Updated star document if successful, None otherwise
+        Updated star document if the star exists, None otherwise
     """
-    result = await stars_collection.update_one(
+    star = await stars_collection.find_one_and_update(
         {"_id": ObjectId(star_id)},
-        {"$set": {"constellation_ID": new_constellation_id}}
+        {"$set": {"constellation_ID": new_constellation_id}},
+        return_document=ReturnDocument.AFTER
     )
-
-    if result.modified_count > 0:
-        star = await stars_collection.find_one({"_id": ObjectId(star_id)})
-        return serialize_star(star)
-    return None
+    loaders.forget("stars", star_id)
+    if star:
+        await user_versions.bump(star.get("user_ID"))
+    return serialize_star(star) if star else None
 
 
 # DELETE
@@ -197,8 +317,14 @@ async def delete_star(star_id: str) -> bool:
         )
 
         # Then delete the star document
-        result = await stars_collection.delete_one({"_id": ObjectId(star_id)})
-        return result.deleted_count > 0
+        star = await stars_collection.find_one_and_delete({"_id": ObjectId(star_id)}, projection={"user_ID": 1})
+        loaders.forget("stars", star_id)
+        loaders.forget_all("journals")
+        if star is None:
+            return False
+        # journals only ever link to their own user's stars
+        await user_versions.bump(star.get("user_ID"))
+        return True
     except Exception as e:
         print(f"Error deleting star: {e}")
         return False
@@ -0,0 +1,87 @@
+import json
+from datetime import timedelta
+
+import bson
+from bson import ObjectId
+from bson.raw_bson import RawBSONDocument
+from pymongo import monitoring
+
+from db.command_monitor import CommandMonitor, _Stats, command_shape, reply_size
+
+
+def test_find_shape_hides_values_keeps_operators():
+    shape = command_shape("find", {"find": "journals", "filter": {"user_ID": "a", "date": {"$lt": 5}},
+                                   "sort": {"date": -1}})
+    assert json.loads(shape) == {"filter": {"user_ID": "?", "date": {"$lt": "?"}}, "sort": ["date"]}
+
+
+def test_same_query_other_values_same_shape():
+    a = command_shape("find", {"filter": {"_id": {"$in": [ObjectId(), ObjectId()]}}})
+    b = command_shape("find", {"filter": {"_id": {"$in": [ObjectId()]}}})
+    assert a == b
+
+
+def test_aggregate_and_write_shapes():
+    pipeline = [{"$match": {"user_ID": "u", "$or": [{"a": 1}, {"b": 2}]}}, {"$lookup": {"from": "stars"}},
+                {"$group": {"_id": None}}]
+    assert json.loads(command_shape("aggregate", {"pipeline": pipeline})) == [
+        {"$match": {"user_ID": "?", "$or": [{"a": "?"}, {"b": "?"}]}}, "$lookup", "$group"]
+    update = {"updates": [{"q": {"_id": ObjectId()}, "u": {"$set": {"x": 1}}}] * 3}
+    assert json.loads(command_shape("update", update)) == {"q": {"_id": "?"}, "statements": 3}
+    assert json.loads(command_shape("insert", {"documents": [{}, {}]})) == {"documents": 2}
+
+
+def test_reply_size():
+    raw = RawBSONDocument(bson.encode({"a": 1}))
+    assert reply_size(raw) == len(raw.raw)
+    assert reply_size({"ok": 1}) == len(bson.encode({"ok": 1}))
+    docs = [{"content": "x" * 100} for _ in range(100)]
+    exact = sum(len(bson.encode(d)) for d in docs)
+    # identical documents: the sampled estimate is exact
+    assert reply_size({"cursor": {"firstBatch": docs}, "ok": 1}) == exact
+    assert reply_size({"cursor": {"nextBatch": []}, "ok": 1}) == 0
+
+
+def test_percentiles_are_bucket_bounds_capped_at_max():
+    stats = _Stats()
+    for ms in [0.5] * 90 + [30] * 9 + [3000]:
+        stats.add(ms, 10)
+    assert stats.percentile(0.5) == 1
+    assert stats.percentile(0.95) == 50
+    assert stats.percentile(1.0) == 3000
+    single = _Stats()
+    single.add(60, 10)
+    assert single.percentile(0.5) == 60, "a bucket bound above the slowest command isn't a useful estimate"
+    assert _Stats().percentile(0.5) is None
+
+
+def test_listener_records_commands_and_slow_log():
+    monitor = CommandMonitor(slow_ms=50, slow_log_size=10)
+    listeners = monitoring._EventListeners([monitor])
+    address = ("localhost", 27017)
+
+    def run(command, reply, ms, request_id, failure=None):
+        listeners.publish_command_start(command, "db", request_id, address, None)
+        if failure is None:
+            listeners.publish_command_success(timedelta(milliseconds=ms), reply, next(iter(command)), request_id,
+                                              address, None)
+        else:
+            listeners.publish_command_failure(timedelta(milliseconds=ms), failure, next(iter(command)), request_id,
+                                              address, None)
+
+    run({"find": "stars", "filter": {"user_ID": "u"}}, {"cursor": {"firstBatch": []}, "ok": 1}, 2, 1)
+    run({"find": "stars", "filter": {"user_ID": "v"}}, {"cursor": {"firstBatch": []}, "ok": 1}, 80, 2)
+    run({"update": "journals", "updates": [{"q": {"_id": 1}}]}, None, 120, 3, failure={"codeName": "WriteConflict"})
+
+    stats = monitor.stats()
+    by_key = {(c["collection"], c["command"]): c for c in stats["commands"]}
+    assert by_key[("stars", "find")]["count"] == 2
+    assert by_key[("journals", "update")]["failures"] == 1
+    assert stats["commands"][0]["collection"] == "journals", "most total time first"
+    assert [e["collection"] for e in stats["slow"]] == ["journals", "stars"]
+    assert stats["slow"][0]["failure"] == "WriteConflict"
+    assert json.loads(stats["slow"][1]["shape"]) == {"user_ID": "?"}
+    assert [c["collection"] for c in monitor.stats("stars")["commands"]] == ["stars"]
+
+    monitor.reset()
+    assert monitor.stats() == {"slow_ms": 50, "commands": [], "slow": []}
@@ -0,0 +1,61 @@
+import gzip
+import json
+
+from bson import ObjectId
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from api import fast_json
+from api.fast_json import CompressionMiddleware, choose_encoding, compress, dumps
+
+
+def test_dumps_turns_object_ids_into_strings():
+    _id = ObjectId()
+    assert json.loads(dumps({"_id": _id, "ids": [_id], 1: "x"})) == {"_id": str(_id), "ids": [str(_id)], "1": "x"}
+
+
+def test_choose_encoding():
+    best = "br" if fast_json.brotli is not None else "gzip"
+    assert choose_encoding("gzip, deflate, br") == best
+    assert choose_encoding("br;q=0.5, gzip") == "gzip"
+    assert choose_encoding("gzip;q=0, br;q=0") is None
+    assert choose_encoding("identity") is None
+    assert choose_encoding("*") == best
+
+
+def test_compress_round_trip():
+    body = b'{"journals":[' + b'{"content":"hello"},' * 200 + b"{}]}"
+    assert gzip.decompress(compress(body, "gzip")) == body
+    if fast_json.brotli is not None:
+        assert fast_json.brotli.decompress(compress(body, "br")) == body
+
+
+def _client() -> TestClient:
+    async def small(request):
+        return PlainTextResponse("tiny", headers={"ETag": '"small"'})
+
+    async def big(request):
+        return PlainTextResponse("x" * 5000, headers={"ETag": '"big"'})
+
+    app = Starlette(routes=[Route("/small", small), Route("/big", big)])
+    app.add_middleware(CompressionMiddleware, minimum_size=1024)
+    return TestClient(app)
+
+
+def test_middleware_compresses_only_big_bodies():
+    client = _client()
+    small = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in small.headers and small.headers["etag"] == '"small"'
+
+    big = client.get("/big", headers={"Accept-Encoding": "gzip"})
+    assert big.headers["content-encoding"] == "gzip"
+    assert big.headers["etag"] == 'W/"big"', "compressed bytes only get a weak ETag"
+    assert big.text == "x" * 5000  # decoded by the client
+
+
+def test_middleware_leaves_identity_requests_alone():
+    response = _client().get("/big", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+    assert response.headers["etag"] == '"big"'
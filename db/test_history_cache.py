@@ -0,0 +1,56 @@
+import asyncio
+
+from db import history_cache
+
+
+def _loader(calls, value):
+    async def load():
+        calls.append(1)
+        return value
+    return load
+
+
+def test_history_cache_hits_until_version_changes():
+    history_cache.clear()
+    calls = []
+
+    async def run():
+        first = await history_cache.get_history("u1", None, 1, _loader(calls, (["j"], ["q"])))
+        again = await history_cache.get_history("u1", None, 1, _loader(calls, (["other"], [])))
+        newer = await history_cache.get_history("u1", None, 2, _loader(calls, (["new"], [])))
+        return first, again, newer
+
+    first, again, newer = asyncio.run(run())
+    assert first == again == (["j"], ["q"])
+    assert newer == (["new"], [])
+    assert len(calls) == 2
+
+
+def test_history_cache_keeps_field_selections_apart():
+    history_cache.clear()
+    calls = []
+
+    async def run():
+        await history_cache.get_history("u2", ["date", "title"], 1, _loader(calls, ("titles", [])))
+        await history_cache.get_history("u2", ["title", "date"], 1, _loader(calls, ("titles", [])))
+        return await history_cache.get_history("u2", None, 1, _loader(calls, ("everything", [])))
+
+    assert asyncio.run(run()) == ("everything", [])
+    assert len(calls) == 2, "same fields in another order should be the same entry"
+
+
+def test_history_cache_drops_a_load_that_raced_a_write():
+    history_cache.clear()
+    calls = []
+
+    async def racing_load():
+        calls.append(1)
+        history_cache.invalidate("u3")  # a write lands while the read is in flight
+        return ("stale", [])
+
+    async def run():
+        await history_cache.get_history("u3", None, 1, racing_load)
+        return await history_cache.get_history("u3", None, 1, _loader(calls, ("fresh", [])))
+
+    assert asyncio.run(run()) == ("fresh", [])
+    assert len(calls) == 2
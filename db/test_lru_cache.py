@@ -0,0 +1,32 @@
+from db.lru_cache import LRUCache
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(max_items=2, max_bytes=1000, sizeof=len)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    assert cache.get("a") == "1"  # a is now the most recently used
+    cache.set("c", "3")
+    assert "b" not in cache
+    assert "a" in cache and "c" in cache
+    assert cache.evictions == 1
+
+
+def test_lru_bounded_by_bytes():
+    cache = LRUCache(max_items=100, max_bytes=10, sizeof=len)
+    cache.set("a", "xxxx")
+    cache.set("b", "xxxx")
+    cache.set("c", "xxxx")
+    assert len(cache) == 2 and "a" not in cache
+    assert cache.bytes == 8
+    # a value bigger than the whole cache is never stored
+    cache.set("huge", "x" * 11)
+    assert "huge" not in cache and cache.bytes == 8
+
+
+def test_lru_replacing_a_key_updates_its_size():
+    cache = LRUCache(max_items=10, max_bytes=100, sizeof=len)
+    cache.set("a", "xxxx")
+    cache.set("a", "xx")
+    assert cache.bytes == 2 and len(cache) == 1
+    assert cache.pop("a") == "xx" and cache.bytes == 0
@@ -0,0 +1,36 @@
+from bson import ObjectId
+
+from db.pagination import build_page_filter, decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip():
+    doc = {"_id": ObjectId(), "date": 1706668800}
+    cursor = encode_cursor(doc)
+    assert "=" not in cursor, "cursor should be url-safe without padding"
+    assert decode_cursor(cursor) == (doc["date"], doc["_id"])
+
+
+def test_decode_cursor_rejects_garbage():
+    for bad in ["", "not-a-cursor", encode_cursor({"_id": "zzz", "date": 1})]:
+        try:
+            decode_cursor(bad)
+        except ValueError:
+            continue
+        raise AssertionError(f"{bad!r} should not decode")
+
+
+def test_first_page_filter():
+    assert build_page_filter("u") == {"user_ID": "u"}
+    assert build_page_filter("u", date_from=10, date_to=20) == {"user_ID": "u", "date": {"$gte": 10, "$lte": 20}}
+
+
+def test_next_page_filter_continues_after_cursor():
+    last = {"_id": ObjectId(), "date": 500}
+    query = build_page_filter("u", encode_cursor(last), date_from=100)
+    assert query["user_ID"] == "u"
+    assert query["date"] == {"$gte": 100}
+    # strictly older, or same date with a smaller _id (ties on date are broken by _id)
+    assert query["$or"] == [
+        {"date": {"$lt": 500}},
+        {"date": 500, "_id": {"$lt": last["_id"]}},
+    ]
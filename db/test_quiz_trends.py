@@ -0,0 +1,48 @@
+import os
+
+import numpy as np
+
+# quiz_trends imports the db layer; the client connects lazily, so any database name will do here
+os.environ.setdefault("MONGODB_DB", "test")
+
+from use_case.quiz_trends import compute_quiz_trends, downsample, rolling_mean, slope_per_week  # noqa: E402
+
+DAY = 86400
+
+
+def test_rolling_mean_ignores_nans():
+    values = np.array([1.0, np.nan, 3.0, 5.0])
+    assert np.allclose(rolling_mean(values, window=2), [1.0, 1.0, 3.0, 4.0])
+    assert np.isnan(rolling_mean(np.array([np.nan]), window=3)[0])
+
+
+def test_slope_per_week():
+    dates = np.arange(4) * 7 * DAY
+    assert slope_per_week(dates, np.array([1.0, 2.0, 3.0, 4.0])) == 1.0
+    assert slope_per_week(dates[:1], np.array([1.0])) is None
+
+
+def test_downsample_keeps_ends_and_peaks():
+    x = np.arange(100, dtype=float)
+    y = np.zeros(100)
+    y[37] = 10.0
+    xs, ys = downsample(x, y, 10)
+    assert len(xs) == 10
+    assert xs[0] == 0 and xs[-1] == 99
+    assert 10.0 in ys, "a spike must survive downsampling"
+
+
+def test_compute_quiz_trends():
+    quizzes = [{"date": i * DAY, "quiz": {"confidence": 2 + i, "bad": "n/a"}, "yesterday_goal": i % 2 == 0}
+               for i in range(6)][::-1]
+    trends = compute_quiz_trends(quizzes, window=3, points=4)
+    assert trends["entries"] == 6
+    assert trends["first_date"] == 0 and trends["last_date"] == 5 * DAY
+    assert trends["goal_completion"]["rate"] == 0.5
+    confidence = trends["metrics"]["confidence"]
+    assert confidence["latest"] == 7 and confidence["min"] == 2 and confidence["max"] == 7
+    assert confidence["rolling_mean"] == 6.0
+    assert confidence["slope_per_week"] == 7.0
+    assert len(confidence["series"]) == 4
+    assert "bad" not in trends["metrics"], "non-numeric answers are not a metric"
+    assert compute_quiz_trends([])["entries"] == 0
@@ -0,0 +1,34 @@
+import time
+
+from use_case.encode_history import estimate_row
+from use_case.select_history_context import estimate_tokens, select_history
+
+DAY = 86400
+
+
+def _journal(days_ago: float, content: str) -> dict:
+    return {"title": "", "content": content, "date": int(time.time() - days_ago * DAY)}
+
+
+def test_select_history_respects_budget_and_order():
+    journals = [_journal(i, "word " * 40) for i in range(10)]
+    selected, quizzes, stats = select_history("", journals, [], token_budget=200)
+    assert 0 < len(selected) < len(journals)
+    assert stats["tokens_used"] <= 200
+    assert stats["journals_included"] + stats["journals_dropped"] == len(journals)
+    dates = [j["date"] for j in selected]
+    assert dates == sorted(dates, reverse=True), "selection stays newest first"
+    assert selected[0] is journals[0], "with no relevance signal the newest entry wins"
+
+
+def test_select_history_prefers_relevant_entries():
+    journals = [_journal(0, "lunch with friends and a movie"), _journal(5, "struggled with fractions homework")]
+    cost = max(estimate_tokens(estimate_row(j)) for j in journals)
+    # room for one entry: the older one matches every message word, which outweighs the newer one's recency
+    selected, _, _ = select_history("fractions homework", journals, [], token_budget=cost)
+    assert [j["content"] for j in selected] == ["struggled with fractions homework"]
+
+
+def test_select_history_zero_budget_selects_nothing():
+    selected, quizzes, stats = select_history("hi", [_journal(0, "x")], [{"quiz": {"c": 5}, "date": 1}], 0)
+    assert selected == [] and quizzes == [] and stats["tokens_used"] == 0
@@ -0,0 +1,75 @@
+import asyncio
+import gzip
+import json
+
+import bson
+from bson import ObjectId
+from bson.raw_bson import RawBSONDocument
+from starlette.applications import Starlette
+from starlette.responses import StreamingResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from api import fast_json
+from api.fast_json import CompressionMiddleware, StreamCompressor, dumps, stream_json_object
+
+
+async def _aiter(items):
+    for item in items:
+        yield item
+
+
+async def _collect(stream):
+    return [chunk async for chunk in stream]
+
+
+def test_dumps_handles_object_ids_and_raw_bson():
+    _id = ObjectId()
+    raw = RawBSONDocument(bson.encode({"_id": _id, "title": "hi"}))
+    assert json.loads(dumps({"a": _id, "doc": raw})) == {"a": str(_id), "doc": {"_id": str(_id), "title": "hi"}}
+
+
+def test_stream_json_object_matches_plain_encoding():
+    journals = [{"_id": ObjectId(), "content": "x" * 50} for _ in range(3)]
+    members = {"journals": _aiter(journals), "quizzes": _aiter([])}
+    body = b"".join(asyncio.run(_collect(stream_json_object(members))))
+    assert json.loads(body) == json.loads(dumps({"journals": journals, "quizzes": []}))
+
+
+def test_stream_json_object_chunks_big_bodies(monkeypatch):
+    monkeypatch.setattr(fast_json, "STREAM_CHUNK_BYTES", 100)
+    docs = [{"n": i, "content": "y" * 60} for i in range(20)]
+    chunks = asyncio.run(_collect(stream_json_object({"items": _aiter(docs)})))
+    assert len(chunks) > 1
+    assert json.loads(b"".join(chunks)) == {"items": docs}
+
+
+def test_stream_compressor_gzip_round_trip():
+    compressor = StreamCompressor("gzip")
+    parts = [b'{"a":[', b"1," * 1000, b"2]}"]
+    body = b"".join(compressor.compress(p) for p in parts) + compressor.finish()
+    assert gzip.decompress(body) == b"".join(parts)
+
+
+def test_stream_compressor_brotli_round_trip():
+    if fast_json.brotli is None:
+        return
+    compressor = StreamCompressor("br")
+    parts = [b"hello " * 500, b"world"]
+    body = b"".join(compressor.compress(p) for p in parts) + compressor.finish()
+    assert fast_json.brotli.decompress(body) == b"".join(parts)
+
+
+def test_middleware_compresses_streamed_json_chunk_by_chunk():
+    docs = [{"n": i, "content": "z" * 200} for i in range(500)]
+
+    async def endpoint(request):
+        return StreamingResponse(stream_json_object({"journals": _aiter(docs)}), media_type="application/json",
+                                 headers={"ETag": '"s"'})
+
+    app = Starlette(routes=[Route("/stream", endpoint)])
+    app.add_middleware(CompressionMiddleware)
+    response = TestClient(app).get("/stream", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["etag"] == 'W/"s"'
+    assert response.json() == {"journals": docs}
@@ -1,5 +1,17 @@
+import os
+
+from . import user_versions
 from .database import users_collection
+from .lru_cache import LRUCache
 from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+# email -> user_id for repeat logins (an account's _id never changes, so entries only go stale on delete / email change)
+USER_ID_CACHE_MAX_ITEMS = int(os.getenv("USER_ID_CACHE_MAX_ITEMS", "50000"))
+USER_ID_CACHE_MAX_BYTES = int(os.getenv("USER_ID_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))
+
+_user_ids = LRUCache(USER_ID_CACHE_MAX_ITEMS, USER_ID_CACHE_MAX_BYTES, sizeof=len)
 
 # helper to convert ObjectId to str
 def serialize_user(user) -> dict:
@@ -9,22 +21,41 @@ def serialize_user(user) -> dict:
 # CREATE
 
 async def get_or_create_user(user_data: dict):
+    """
+    Find the user with this email, creating them from user_data if there is none, in one atomic
+    upsert on the unique email index (two devices logging in at once get the same user).
+    """
     email = user_data["email"]
+    try:
+        user = await users_collection.find_one_and_update(
+            {"email": email},
+            {"$setOnInsert": dict(user_data)},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+    except DuplicateKeyError:
+        # the server retries these upserts itself; if one still loses the race, the winner's doc is there now
+        user = await users_collection.find_one({"email": email})
+    user = serialize_user(user)
+    _user_ids.set(email, user["_id"])
+    return user
 
-    # 1. Try find existing user
-    user = await users_collection.find_one({"email": email})
-    if user:
-        return serialize_user(user)
 
-    # 2. Otherwise create new
-    result = await users_collection.insert_one(user_data)
-    user = await users_collection.find_one({"_id": result.inserted_id})
-    return serialize_user(user)
+async def get_or_create_user_id(user_data: dict) -> str:
+    """The user_id for this email, from the in-process cache when they have logged in here before."""
+    user_id = _user_ids.get(user_data["email"])
+    if user_id is not None:
+        return user_id
+    return (await get_or_create_user(user_data))["_id"]
+
+
+def user_id_cache_stats() -> dict:
+    return _user_ids.stats()
 
 
 async def create_user(user_data: dict):
-    result = await users_collection.insert_one(user_data)
-    user = await users_collection.find_one({"_id": result.inserted_id})
+    user = dict(user_data)
+    await users_collection.insert_one(user)
     return serialize_user(user)
 
 # READ
@@ -36,13 +67,22 @@ async def get_user_by_id(user_id: str):
 
 # UPDATE
 async def update_user(user_id: str, update_data: dict):
-    await users_collection.update_one({"_id": ObjectId(user_id)}, {"$set": update_data})
-    user = await users_collection.find_one({"_id": ObjectId(user_id)})
+    user = await users_collection.find_one_and_update(
+        {"_id": ObjectId(user_id)}, {"$set": update_data}, return_document=ReturnDocument.AFTER
+    )
     if user:
+        if "email" in update_data:
+            # the old address isn't known here, and email changes are rare: start the cache over
+            _user_ids.clear()
+        await user_versions.bump(user_id)
         return serialize_user(user)
     return None
 
 # DELETE
 async def delete_user(user_id: str):
-    result = await users_collection.delete_one({"_id": ObjectId(user_id)})
-    return result.deleted_count > 0
+    user = await users_collection.find_one_and_delete({"_id": ObjectId(user_id)}, projection={"email": 1})
+    if user is None:
+        return False
+    _user_ids.pop(user.get("email"))
+    await user_versions.bump(user_id)
+    return True
@@ -0,0 +1,62 @@
+# Description: per-user data version - a counter bumped after every db-layer write to a user's journals,
+# quizzes, stars or profile. the api derives ETags from it, and db/history_cache.py tags entries with it,
+# so "has this user's data changed?" is one _id lookup, in any worker process.
+# a bump can fail after its write went through, so nothing validated by a version is trusted for longer than
+# DATA_VERSION_MAX_AGE_SECONDS: ETags carry a per-user time window and history cache entries expire.
+# Created on 2026-10-18
+import os
+import time
+import zlib
+from typing import Optional
+
+from dotenv import load_dotenv
+from pymongo import UpdateOne
+
+from db import history_cache
+from db.database import read_session, reads_for, user_versions_collection
+
+load_dotenv()
+
+# longest a missed bump can go unnoticed (stale 304s / cached history)
+DATA_VERSION_MAX_AGE_SECONDS = int(os.getenv("DATA_VERSION_MAX_AGE_SECONDS", "300"))
+BUMP_ATTEMPTS = 2
+
+
+def validity_window(user_ID: str) -> int:
+    """
+    Number of the current DATA_VERSION_MAX_AGE_SECONDS window for this user. ETags include it, so even
+    an unchanged version gets a fresh ETag once per window. Offset per user so clients don't all refetch at once.
+    """
+    offset = zlib.crc32(user_ID.encode()) % DATA_VERSION_MAX_AGE_SECONDS
+    return int((time.time() + offset) // DATA_VERSION_MAX_AGE_SECONDS)
+
+
+async def get_version(user_ID: str) -> int:
+    """
+    Current version of a user's data (0 if they have never written anything).
+    Read like the history it validates (same read preference, same causal session - see db/database.py causal_reads).
+    """
+    doc = await reads_for("history", user_versions_collection).find_one({"_id": user_ID}, {"version": 1},
+                                                                         session=read_session())
+    return doc["version"] if doc else 0
+
+
+async def bump(*user_IDs: Optional[str]):
+    """
+    Mark these users' data as changed. Call after the write has been applied, never before:
+    a reader that sees the new version must also see the new data.
+    """
+    user_IDs = {u for u in user_IDs if u}
+    if not user_IDs:
+        return
+    history_cache.invalidate(*user_IDs)
+    for attempt in range(1, BUMP_ATTEMPTS + 1):
+        try:
+            await user_versions_collection.bulk_write(
+                [UpdateOne({"_id": u}, {"$inc": {"version": 1}}, upsert=True) for u in user_IDs], ordered=False
+            )
+            return
+        except Exception as e:
+            # the data write already succeeded, so this isn't raised (the caller's retry would write twice);
+            # other clients / workers may keep a stale copy for up to DATA_VERSION_MAX_AGE_SECONDS
+            print(f"Error bumping data version for {user_IDs} (attempt {attempt}/{BUMP_ATTEMPTS}): {e}")
@@ -12,19 +12,23 @@ class AiInfo:
     - content: user prompt
     - date: unix timestamp
     - context: raw dict of retrieval options
+    - token_budget: optional cap on prompt tokens spent on past journals/quizzes
     """
     content: str
     #date: int
     read_journal: bool
     read_quizzes: bool
     user_ID: str
+    token_budget: Optional[int]
 
-    def __init__(self, user_ID: str, content: str, read_journal: bool, read_quizzes: bool):
+    def __init__(self, user_ID: str, content: str, read_journal: bool, read_quizzes: bool,
+                 token_budget: Optional[int] = None):
         self.user_ID = user_ID
         self.content = content
         #self.date = date
         self.read_journal = read_journal
         self.read_quizzes = read_quizzes
+        self.token_budget = token_budget
 
 
 
@@ -3,5 +3,6 @@
 from entities.journal import JournalEntry
 from ai.gemini import ai_keywords
 
-def prompt_ai(data: JournalEntry):
-   keyphrase =  ai_keywords(data.title + "\n"+ data.content)
+async def prompt_ai(data: JournalEntry):
+   keyphrase = await ai_keywords(data.title + "\n"+ data.content)
+   return keyphrase
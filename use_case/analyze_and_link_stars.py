@@ -6,6 +6,14 @@ from db import star_crud, constellation_crud, journal_crud
 from ai.gemini import analyze_text_for_topics
 
 
+def _confidence(topic: dict) -> int:
+    """The model's 1-5 confidence for a topic; 3 when it is missing or not a number (e.g. "high", null)."""
+    try:
+        return int(topic.get("confidence", 3))
+    except (TypeError, ValueError):
+        return 3
+
+
 async def analyze_and_link_stars(
     user_id: str,
     journal_id: str,
@@ -17,12 +25,15 @@ async def analyze_and_link_stars(
 
     Flow:
     1. Call AI (Gemini) to extract topics from journal text
-    2. For each extracted topic:
-       - Determine which constellation it belongs to
-       - Create or find existing star with that topic name
-       - Link the star to the journal (bidirectional)
+    2. For the whole topic set at once:
+       - Resolve / create every constellation they belong to
+       - Upsert every star by (user_ID, name) and add the journal to it
+       - Add all the stars to the journal
     3. Return summary of linked stars and constellations
 
+    The database work is a constant handful of round trips no matter how many
+    topics were extracted, and is safe against concurrent saves of the same topic.
+
     Args:
         user_id: The user who wrote the journal
         journal_id: The journal entry ID
@@ -31,7 +42,7 @@ async def analyze_and_link_stars(
     Returns:
         Dictionary with:
         - stars: List of linked star documents
-        - constellations: Set of constellation names
+        - constellations: List of constellation names
         - success: Boolean
     """
     try:
@@ -40,65 +51,40 @@ async def analyze_and_link_stars(
         ai_result = await analyze_text_for_topics(journal_text)
         extracted_topics = ai_result.get("topics", [])
 
-        if not extracted_topics:
+        # Step 2: one entry per topic name (the model sometimes repeats itself)
+        topics = {}
+        for topic_data in extracted_topics:
+            topic_name = str(topic_data.get("name", "")).strip()
+            if topic_name and topic_name not in topics:
+                topics[topic_name] = topic_data
+
+        if not topics:
             return {
                 "stars": [],
-                "constellations": set(),
+                "constellations": [],
                 "success": True,
                 "message": "No topics extracted from journal"
             }
 
-        linked_stars = []
-        constellation_names = set()
+        constellation_ids = await constellation_crud.get_or_create_constellations(
+            [t.get("constellation") or "General" for t in topics.values()]
+        )
 
-        # Step 2: Process each extracted topic
-        for topic_data in extracted_topics:
-            topic_name = topic_data.get("name", "").strip()
-            constellation_name = topic_data.get("constellation", "General")
-
-            if not topic_name:
-                continue
-
-            # Get or create constellation
-            constellation = await constellation_crud.create_constellation(
-                name=constellation_name,
-                description=f"Auto-generated constellation for {constellation_name} topics",
-                is_global=True
-            )
-            constellation_id = constellation["_id"]
-            constellation_names.add(constellation_name)
-
-            # Get or create star for this topic
-            existing_star = await star_crud.get_star_by_name(user_id, topic_name)
-
-            if existing_star:
-                star_id = existing_star["_id"]
-
-                # Check if star belongs to different constellation
-                if existing_star.get("constellation_id") != constellation_id:
-                    # Update star's constellation if confidence is high enough
-                    confidence = topic_data.get("confidence", 3)
-                    if confidence >= 4:  # Only update if we're very confident
-                        await star_crud.update_star_constellation(star_id, constellation_id)
-            else:
-                # Create new star
-                star = await star_crud.create_star(
-                    user_id=user_id,
-                    name=topic_name,
-                    constellation_id=constellation_id
-                )
-                star_id = star["_id"]
-
-            # Link star to journal (bidirectional)
-            await star_crud.link_star_to_journal(star_id, journal_id)
-
-            # Fetch updated star
-            star = await star_crud.get_star_by_id(star_id)
-            linked_stars.append(star)
+        linked_stars = await star_crud.upsert_journal_stars(user_id, journal_id, [
+            {
+                "name": name,
+                "constellation_ID": constellation_ids[t.get("constellation") or "General"],
+                # Only move an existing star to another constellation if we're very confident
+                "move": _confidence(t) >= 4,
+            }
+            for name, t in topics.items()
+        ])
+
+        await journal_crud.link_journal_to_stars(journal_id, [star["_id"] for star in linked_stars])
 
         return {
             "stars": linked_stars,
-            "constellations": list(constellation_names),
+            "constellations": list(constellation_ids),
             "success": True,
             "message": f"Linked {len(linked_stars)} stars to journal"
         }
@@ -127,15 +113,10 @@ async def get_journal_with_stars(journal_id: str) -> Dict[str, Any]:
     if not journal:
         return None
 
-    star_ids = journal.get("star_ids", [])
-    stars = []
+    # links are written to star_IDs; older journals may also have star_ids from add_stars_to_journal
+    star_ids = list(dict.fromkeys(journal.get("star_IDs", []) + journal.get("star_ids", [])))
 
-    for star_id in star_ids:
-        star = await star_crud.get_star_by_id(star_id)
-        if star:
-            stars.append(star)
-
-    journal["stars"] = stars
+    journal["stars"] = await star_crud.get_stars_by_ids(star_ids)
     return journal
 
 
@@ -153,34 +134,8 @@ async def get_constellation_map(user_ID: str) -> Dict[str, Any]:
     Returns:
         Dictionary with constellation hierarchy
     """
-    constellations = await constellation_crud.get_all_constellations(
-        user_ID=user_ID,
-        include_stars=True
-    )
-
-    # Enhance with statistics
-    map_data = []
-    for constellation in constellations:
-        stars = constellation.get("stars", [])
-
-        # Add journal counts to stars
-        for star in stars:
-            star["journal_count"] = len(star.get("journal_ids", []))
-
-        # Sort stars by journal count (descending)
-        stars.sort(key=lambda s: s["journal_count"], reverse=True)
-
-        map_data.append({
-            "constellation_id": constellation["_id"],
-            "constellation_name": constellation["name"],
-            "description": constellation.get("description", ""),
-            "star_count": len(stars),
-            "total_journals": sum(s["journal_count"] for s in stars),
-            "stars": stars
-        })
-
-    # Sort constellations by total journals (descending)
-    map_data.sort(key=lambda c: c["total_journals"], reverse=True)
+    # counts and sorting all happen inside the aggregation
+    map_data = await constellation_crud.get_constellation_map(user_ID)
 
     return {
         "user_ID": user_ID,
@@ -204,13 +159,7 @@ async def expand_star_to_journals(star_id: str) -> Dict[str, Any]:
     if not star:
         return None
 
-    journal_ids = star.get("journal_ids", [])
-    journals = []
-
-    for journal_id in journal_ids:
-        journal = await journal_crud.get_journal_by_id(journal_id)
-        if journal:
-            journals.append(journal)
+    journals = await journal_crud.get_journals_by_ids(star.get("journal_IDs", []))
 
     # Sort journals by date (most recent first)
     journals.sort(key=lambda j: j.get("date", 0), reverse=True)
@@ -218,7 +167,7 @@ async def expand_star_to_journals(star_id: str) -> Dict[str, Any]:
     return {
         "star_id": star_id,
         "star_name": star["name"],
-        "constellation_id": star["constellation_id"],
+        "constellation_id": star.get("constellation_ID"),
         "journal_count": len(journals),
         "journals": journals
     }
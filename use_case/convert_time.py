@@ -2,6 +2,26 @@
 # Created by Emilia on 2026-01-31
 from datetime import datetime
 from copy import deepcopy
+from typing import Optional
+
+def format_unix_time(ts_raw) -> Optional[str]:
+    """
+    Human-readable form of a unix timestamp, e.g. "2026:01:31 3pm".
+    Accepts int/float/numeric strings; returns None if the value isn't a timestamp.
+    """
+    # Some existing DB records may store unix time as a string.
+    try:
+        ts = int(ts_raw)
+    except (TypeError, ValueError):
+        return None
+
+    dt = datetime.fromtimestamp(ts)
+
+    hour = dt.strftime("%I").lstrip("0")  # remove leading zero
+    am_pm = dt.strftime("%p").lower()
+
+    return f"{dt.year}:{dt.month:02d}:{dt.day:02d} {hour}{am_pm}"
+
 
 def convert_unix_time(entry: dict) -> dict:
     """
@@ -16,25 +36,12 @@ def convert_unix_time(entry: dict) -> dict:
     """
     new_entry = deepcopy(entry)
 
-    ts_raw = new_entry.get("date")
-    if ts_raw is None:
-        return new_entry
-
-    # Some existing DB records may store unix time as a string.
-    try:
-        ts = int(ts_raw)
-    except (TypeError, ValueError):
+    formatted = format_unix_time(new_entry.get("date"))
+    if formatted is None:
         return new_entry
 
-    dt = datetime.fromtimestamp(ts)
-
-    hour = dt.strftime("%I").lstrip("0")  # remove leading zero
-    am_pm = dt.strftime("%p").lower()
-
-    formatted = f"{dt.year}:{dt.month:02d}:{dt.day:02d} {hour}{am_pm}"
-
     # Preserve unix timestamp for trend/progression uses.
-    new_entry["date_unix"] = ts
+    new_entry["date_unix"] = int(new_entry["date"])
     new_entry["date_str"] = formatted
 
     # Backwards compatible: existing code expects `date` to be the display string.
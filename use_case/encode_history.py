@@ -0,0 +1,74 @@
+# Description: compact table encoding of journal / quiz history for the AI prompt.
+# one header line, then one row per entry with only the fields the model uses
+# (no _id, user_ID or duplicated date keys), built straight from the db documents without copying them.
+# Created on 2026-10-18
+from collections import Counter
+from typing import List
+
+from use_case.convert_time import format_unix_time
+
+SEPARATOR = " | "
+
+
+def _cell(value) -> str:
+    """One table cell: single line, and no stray separators."""
+    if value is None:
+        return ""
+    return " ".join(str(value).split()).replace("|", "/")
+
+
+def journal_row(journal: dict) -> str:
+    return SEPARATOR.join([
+        _cell(format_unix_time(journal.get("date")) or journal.get("date")),
+        _cell(journal.get("title")),
+        _cell(journal.get("content")),
+    ])
+
+
+def encode_journals(journals: List[dict]) -> str:
+    """
+    date | title | text
+    2026:01:31 3pm | fractions | I finally got common denominators ...
+    """
+    if not journals:
+        return "(none)"
+    return "\n".join(["date | title | text"] + [journal_row(j) for j in journals])
+
+
+def _metric_columns(quizzes: List[dict]) -> List[str]:
+    """Every metric any check-in used, most common first so sparse custom metrics end up on the right."""
+    counts = Counter()
+    for quiz in quizzes:
+        counts.update((quiz.get("quiz") or {}).keys())
+    return [name for name, _ in counts.most_common()]
+
+
+def quiz_row(quiz: dict, metrics: List[str]) -> str:
+    values = quiz.get("quiz") or {}
+    return SEPARATOR.join(
+        [_cell(format_unix_time(quiz.get("date")) or quiz.get("date")),
+         _cell(quiz.get("yesterday_goal")),
+         _cell(quiz.get("tomorrow"))]
+        + [_cell(values.get(metric)) for metric in metrics]
+    )
+
+
+def encode_quizzes(quizzes: List[dict]) -> str:
+    """
+    date | met_yesterday_goal | plan_for_tomorrow | confidence | motivation | ...
+    2026:01:31 3pm | 1 | finish lab | 7 | 4
+
+    Ratings are 1-10; an empty cell means that metric wasn't asked that day.
+    """
+    if not quizzes:
+        return "(none)"
+    metrics = _metric_columns(quizzes)
+    header = SEPARATOR.join(["date", "met_yesterday_goal", "plan_for_tomorrow"] + metrics)
+    return "\n".join([header] + [quiz_row(q, metrics) for q in quizzes])
+
+
+def estimate_row(entry: dict) -> str:
+    """The row an entry will take up in the prompt, for budgeting before the table is built."""
+    if "quiz" in entry:
+        return quiz_row(entry, list((entry.get("quiz") or {}).keys()))
+    return journal_row(entry)
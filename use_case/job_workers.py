@@ -0,0 +1,154 @@
+# Description: asyncio workers that run queued background jobs (post-save journal analysis).
+# jobs live in mongo (db/job_queue_crud.py) so they survive restarts; any worker in any process can pick them up.
+# Created on 2026-10-18
+import asyncio
+import os
+import socket
+import uuid
+from typing import Awaitable, Callable, Dict, List
+
+from db import job_queue_crud, journal_crud
+from db.loaders import request_scope
+from entities.journal import JournalEntry
+from use_case.ai_retrieve_keywords_journal_entry import prompt_ai
+from use_case.analyze_and_link_stars import analyze_and_link_stars
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+# a job whose worker stops renewing its lease for this many seconds is assumed lost and handed to another worker
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "120"))
+# running jobs renew their lease this often, so a long but healthy job (several slow gemini calls) keeps it
+JOB_HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", str(JOB_LEASE_SECONDS / 3)))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "5"))
+JOB_RETRY_BASE_SECONDS = float(os.getenv("JOB_RETRY_BASE_SECONDS", "10"))
+
+# job types
+JOURNAL_KEYWORDS = "journal_keywords"
+JOURNAL_STARS = "journal_stars"
+
+
+async def _run_journal_keywords(payload: dict):
+    """Extract the journal's micro-summary phrase and store it on the journal."""
+    entry = JournalEntry(payload["journal_id"], payload.get("title") or "", payload["user_ID"],
+                         payload["date"], payload["content"])
+    keyphrase = await prompt_ai(entry)
+    await journal_crud.update_journal(payload["journal_id"], {"keyphrase": keyphrase})
+
+
+async def _run_journal_stars(payload: dict):
+    """Extract topics from the journal and link them as stars."""
+    text = f"{payload.get('title') or ''}\n{payload['content']}"
+    result = await analyze_and_link_stars(payload["user_ID"], payload["journal_id"], text)
+    if not result["success"]:
+        raise RuntimeError(result.get("error", "star linking failed"))
+
+
+HANDLERS: Dict[str, Callable[[dict], Awaitable[None]]] = {
+    JOURNAL_KEYWORDS: _run_journal_keywords,
+    JOURNAL_STARS: _run_journal_stars,
+}
+
+_tasks: List[asyncio.Task] = []
+_wake = asyncio.Event()
+_stopping = asyncio.Event()
+
+
+async def enqueue_journal_analysis(journal: dict):
+    """Queue keyword extraction and star linking for a freshly saved journal."""
+    await enqueue_journals_analysis([journal])
+
+
+async def enqueue_journals_analysis(journals: List[dict]):
+    """Queue keyword extraction and star linking for many saved journals in one insert."""
+    jobs = []
+    for journal in journals:
+        payload = {
+            "journal_id": journal["_id"],
+            "user_ID": journal["user_ID"],
+            "title": journal.get("title"),
+            "content": journal["content"],
+            "date": journal["date"],
+        }
+        jobs.append((JOURNAL_KEYWORDS, payload))
+        jobs.append((JOURNAL_STARS, payload))
+    await job_queue_crud.enqueue_jobs(jobs)
+    # nudge local workers so the jobs don't wait for the next poll
+    _wake.set()
+
+
+async def _heartbeat(job: dict, worker_id: str, work: asyncio.Task):
+    """Renew the job's lease while it runs; if another worker has taken it over, stop running it here."""
+    while True:
+        await asyncio.sleep(JOB_HEARTBEAT_SECONDS)
+        try:
+            renewed = await job_queue_crud.renew_lease(job, worker_id, JOB_LEASE_SECONDS)
+        except Exception as e:
+            # keep running; the next beat tries again before the lease runs out
+            print(f"Error renewing lease of job {job['_id']}: {e}")
+            continue
+        if not renewed:
+            print(f"Job {job['_id']} ({job['type']}) lost its lease, stopping it here")
+            work.cancel()
+            return
+
+
+async def _run_one(job: dict, worker_id: str):
+    handler = HANDLERS.get(job["type"])
+    if handler is None:
+        error = f"no handler for job type {job['type']}"
+    else:
+        with request_scope():
+            work = asyncio.create_task(handler(job["payload"]))
+        heartbeat = asyncio.create_task(_heartbeat(job, worker_id, work))
+        try:
+            await asyncio.wait({work})
+        finally:
+            heartbeat.cancel()
+            if not work.done():
+                work.cancel()
+        if work.cancelled():
+            # lease lost: the worker that has it now records the outcome
+            return
+        error = work.exception()
+        if error is None:
+            await job_queue_crud.complete_job(job, worker_id)
+            return
+
+    print(f"Job {job['_id']} ({job['type']}) failed on attempt {job['attempts']}: {error}")
+    delay = JOB_RETRY_BASE_SECONDS * 2 ** (job["attempts"] - 1)
+    await job_queue_crud.fail_job(job, worker_id, str(error), delay)
+
+
+async def _worker(worker_id: str):
+    while not _stopping.is_set():
+        try:
+            job = await job_queue_crud.lease_job(worker_id, JOB_LEASE_SECONDS)
+        except Exception as e:
+            print(f"Error leasing job: {e}")
+            job = None
+
+        if job is None:
+            _wake.clear()
+            try:
+                await asyncio.wait_for(_wake.wait(), timeout=JOB_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            continue
+
+        await _run_one(job, worker_id)
+
+
+def start_workers(count: int = JOB_WORKERS):
+    """Start `count` worker tasks on the running event loop (call on server start)."""
+    _stopping.clear()
+    prefix = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+    for i in range(count):
+        _tasks.append(asyncio.create_task(_worker(f"{prefix}-{i}")))
+    print(f"✓ Started {count} background job workers")
+
+
+async def stop_workers():
+    """Stop workers after their current job (call on server stop). Unfinished leases are retried elsewhere."""
+    _stopping.set()
+    _wake.set()
+    await asyncio.gather(*_tasks, return_exceptions=True)
+    _tasks.clear()
@@ -1,15 +1,41 @@
 # Description:
 # Created by Emilia on 2026-01-31
-from ai.gemini import get_response
+import json
+
+from ai.gemini import get_response, stream_response
 from entities.ai_data import AiInfo
 
 
 def convert_ai(data: dict):
     """
     Converts raw request dict into AiInfo domain entity.
+    Raises KeyError / ValueError / TypeError if a required field is missing or malformed.
     """
-    return AiInfo(data["user_ID"], data["content"], data["read_journal"], data["read_quizzes"])
+    token_budget = data.get("token_budget")
+    if token_budget is not None:
+        token_budget = int(token_budget)
+        if token_budget < 0:
+            raise ValueError("token_budget must be 0 or more")
+    return AiInfo(data["user_ID"], data["content"], data["read_journal"], data["read_quizzes"], token_budget)
 
 
 async def prompt_ai(data: AiInfo):
     return await get_response(data)
+
+
+async def stream_prompt_ai(data: AiInfo):
+    """
+    Server-sent-event stream of the AI reply.
+
+    Emits a `history` event with the context stats, a `message` event per text chunk,
+    then a `done` event (or an `error` event if the model call fails mid-stream).
+    """
+    try:
+        async for kind, payload in stream_response(data):
+            if kind == "history":
+                yield f"event: history\ndata: {json.dumps(payload)}\n\n"
+            else:
+                yield f"data: {json.dumps({'text': payload})}\n\n"
+        yield "event: done\ndata: {}\n\n"
+    except Exception as e:
+        yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n"
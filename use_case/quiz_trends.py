@@ -0,0 +1,230 @@
+# Description: quiz trend engine - turns a user's check-in history into per-metric numpy arrays
+# and computes rolling means, slopes, volatility and goal-completion rate in vectorized form.
+# long series are downsampled to a fixed number of shape-preserving points (largest triangle three buckets).
+# Created on 2026-10-18
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+from db.quiz_crud import get_user_quiz_entries, quiz_projection
+from use_case.convert_time import format_unix_time
+
+load_dotenv()
+
+# rolling mean window, in check-ins
+TREND_WINDOW = int(os.getenv("QUIZ_TRENDS_WINDOW", "7"))
+# max points per downsampled series
+TREND_POINTS = int(os.getenv("QUIZ_TRENDS_POINTS", "30"))
+
+SECONDS_PER_WEEK = 7 * 86400
+
+TREND_FIELDS = ["date", "quiz", "yesterday_goal"]
+
+
+def _to_float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def build_arrays(quizzes: List[dict]) -> Tuple[np.ndarray, Dict[str, np.ndarray], np.ndarray]:
+    """
+    Load check-ins into column arrays, oldest first.
+
+    Args:
+        quizzes: Quiz documents in any order (unix `date`, `quiz` metric dict, `yesterday_goal`)
+
+    Returns:
+        (dates, metrics, goals) - dates is float seconds, metrics maps each metric name to an
+        array aligned with dates (NaN where that metric wasn't asked), goals is 1/0/NaN.
+    """
+    quizzes = [q for q in quizzes if not np.isnan(_to_float(q.get("date")))]
+    dates = np.fromiter((_to_float(q.get("date")) for q in quizzes), dtype=np.float64, count=len(quizzes))
+    order = np.argsort(dates, kind="stable")
+    dates = dates[order]
+    ordered = [quizzes[i] for i in order]
+
+    names = []
+    for quiz in ordered:
+        for name in (quiz.get("quiz") or {}):
+            if name not in names:
+                names.append(name)
+
+    metrics = {
+        name: np.fromiter((_to_float((q.get("quiz") or {}).get(name)) for q in ordered),
+                          dtype=np.float64, count=len(ordered))
+        for name in names
+    }
+    goals = np.fromiter((_to_float(q.get("yesterday_goal")) for q in ordered), dtype=np.float64, count=len(ordered))
+    return dates, metrics, goals
+
+
+def rolling_mean(values: np.ndarray, window: int = TREND_WINDOW) -> np.ndarray:
+    """Trailing mean over the last `window` entries, ignoring NaNs (NaN where the window has no values)."""
+    valid = ~np.isnan(values)
+    sums = np.concatenate(([0.0], np.cumsum(np.where(valid, values, 0.0))))
+    counts = np.concatenate(([0], np.cumsum(valid)))
+    end = np.arange(1, len(values) + 1)
+    start = np.maximum(0, end - window)
+    window_counts = counts[end] - counts[start]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(window_counts > 0, (sums[end] - sums[start]) / window_counts, np.nan)
+
+
+def slope_per_week(dates: np.ndarray, values: np.ndarray) -> Optional[float]:
+    """Least-squares slope of the values against time, in rating points per week."""
+    valid = ~np.isnan(values)
+    x, y = dates[valid], values[valid]
+    if len(x) < 2:
+        return None
+    dx = x - x.mean()
+    denominator = np.dot(dx, dx)
+    if denominator == 0:
+        return None
+    return float(np.dot(dx, y - y.mean()) / denominator * SECONDS_PER_WEEK)
+
+
+def volatility(values: np.ndarray) -> Optional[float]:
+    """Standard deviation of the change between consecutive check-ins (how jumpy the rating is)."""
+    y = values[~np.isnan(values)]
+    if len(y) < 3:
+        return None
+    return float(np.std(np.diff(y)))
+
+
+def downsample(x: np.ndarray, y: np.ndarray, points: int = TREND_POINTS) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Largest-triangle-three-buckets downsampling.
+
+    Keeps the first and last point, splits the rest into `points - 2` buckets and from each keeps the
+    point forming the largest triangle with the previous kept point and the next bucket's average,
+    so peaks and dips survive where plain striding would drop them. NaNs are removed first.
+    """
+    valid = ~np.isnan(y)
+    x, y = x[valid], y[valid]
+    n = len(x)
+    if points < 3 or n <= points:
+        return x, y
+
+    edges = np.floor(np.linspace(1, n - 1, points - 1)).astype(int)
+    kept = np.empty(points, dtype=int)
+    kept[0], kept[-1] = 0, n - 1
+    a = 0
+    for i in range(points - 2):
+        start, end = edges[i], max(edges[i + 1], edges[i] + 1)
+        next_start, next_end = end, edges[i + 2] if i + 2 < len(edges) else n
+        next_end = max(next_end, next_start + 1)
+        avg_x, avg_y = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        kept[i + 1] = a
+    return x[kept], y[kept]
+
+
+def _round(value, digits: int = 2):
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    return round(float(value), digits)
+
+
+def _series(x: np.ndarray, y: np.ndarray, points: int) -> List[list]:
+    xs, ys = downsample(x, y, points)
+    return [[int(t), _round(v)] for t, v in zip(xs, ys)]
+
+
+def compute_quiz_trends(quizzes: List[dict], window: int = TREND_WINDOW, points: int = TREND_POINTS) -> dict:
+    """
+    Trend summary for a user's check-ins.
+
+    Args:
+        quizzes: Quiz documents (only date, quiz and yesterday_goal are used)
+        window: Rolling mean window, in check-ins
+        points: Max points kept per downsampled series
+
+    Returns:
+        {"entries", "first_date", "last_date", "window",
+         "goal_completion": {"rate", "recent_rate", "answered"},
+         "metrics": {name: {"count", "mean", "latest", "rolling_mean", "slope_per_week",
+                            "volatility", "min", "max", "series", "rolling_series"}}}
+        series are [unix date, value] pairs, oldest first.
+    """
+    dates, metrics, goals = build_arrays(quizzes)
+    summary = {
+        "entries": int(len(dates)),
+        "first_date": int(dates[0]) if len(dates) else None,
+        "last_date": int(dates[-1]) if len(dates) else None,
+        "window": window,
+        "goal_completion": {"rate": None, "recent_rate": None, "answered": 0},
+        "metrics": {},
+    }
+    if not len(dates):
+        return summary
+
+    answered = goals[~np.isnan(goals)]
+    summary["goal_completion"] = {
+        "rate": _round(answered.mean(), 3) if len(answered) else None,
+        "recent_rate": _round(answered[-window:].mean(), 3) if len(answered) else None,
+        "answered": int(len(answered)),
+    }
+
+    for name, values in metrics.items():
+        present = values[~np.isnan(values)]
+        if not len(present):
+            continue
+        rolling = rolling_mean(values, window)
+        summary["metrics"][name] = {
+            "count": int(len(present)),
+            "mean": _round(present.mean()),
+            "latest": _round(present[-1]),
+            "rolling_mean": _round(rolling[~np.isnan(rolling)][-1]),
+            "slope_per_week": _round(slope_per_week(dates, values), 3),
+            "volatility": _round(volatility(values)),
+            "min": _round(present.min()),
+            "max": _round(present.max()),
+            "series": _series(dates, values, points),
+            "rolling_series": _series(dates, np.where(np.isnan(values), np.nan, rolling), points),
+        }
+    return summary
+
+
+async def get_quiz_trends(user_ID: str, window: int = TREND_WINDOW, points: int = TREND_POINTS) -> dict:
+    """Load a user's check-ins (only the fields trends need) and summarize them."""
+    quizzes = await get_user_quiz_entries(user_ID, quiz_projection(TREND_FIELDS), serialize=False)
+    return {"user_ID": user_ID, **compute_quiz_trends(quizzes, window, points)}
+
+
+def encode_trends(trends: dict, points: int = 12) -> str:
+    """
+    Compact trend table for the AI prompt.
+
+    metric | checkins | mean | latest | rolling_mean | slope_per_week | volatility | shape
+    confidence | 84 | 5.9 | 7 | 6.4 | +0.21 | 1.1 | 4 5 5 6 5 7 ...
+
+    shape is the rolling mean, downsampled again to `points` values.
+    """
+    if not trends["entries"]:
+        return "(none)"
+    first = format_unix_time(trends["first_date"]) or trends["first_date"]
+    last = format_unix_time(trends["last_date"]) or trends["last_date"]
+    lines = [f"{trends['entries']} check-ins from {first} to {last}; "
+             f"rolling mean over the last {trends['window']} check-ins; shape = rolling mean, oldest to newest"]
+
+    goal = trends["goal_completion"]
+    if goal["rate"] is not None:
+        lines.append(f"met yesterday's goal: {goal['rate']:.0%} overall, {goal['recent_rate']:.0%} recently")
+
+    lines.append("metric | checkins | mean | latest | rolling_mean | slope_per_week | volatility | shape")
+    for name, m in trends["metrics"].items():
+        shape_x = np.array([p[0] for p in m["rolling_series"]], dtype=np.float64)
+        shape_y = np.array([p[1] for p in m["rolling_series"]], dtype=np.float64)
+        _, shape = downsample(shape_x, shape_y, points)
+        slope = "" if m["slope_per_week"] is None else f"{m['slope_per_week']:+g}"
+        lines.append(" | ".join([
+            name, str(m["count"]), f"{m['mean']:g}", f"{m['latest']:g}", f"{m['rolling_mean']:g}", slope,
+            "" if m["volatility"] is None else f"{m['volatility']:g}",
+            " ".join(f"{v:g}" for v in shape),
+        ]))
+    return "\n".join(lines)
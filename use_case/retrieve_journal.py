@@ -1,9 +1,13 @@
 # Description: retrieve specific journal full info by id
 # Created by Emilia on 2026-01-31
-from typing import Optional
+from typing import List, Optional
 
-from db.journal_crud import get_journal_by_id
+from db.journal_crud import get_journal_by_id, get_journals_by_ids
 
 
 async def retrieve_journal_by_id(journal_id: str) -> dict:
       return await get_journal_by_id(journal_id)
+
+
+async def retrieve_journals_by_ids(journal_ids: List[str]) -> List[dict]:
+      return await get_journals_by_ids(journal_ids)
@@ -1,9 +1,20 @@
 # Description: retrieves a list of journals with id title, date, short preview of first bit.
 # Created by Emilia on 2026-01-31
-from db.journal_crud import get_user_journals
+from typing import List, Optional
 
+from db.journal_crud import get_user_journals, get_user_journals_page, journal_projection
 
+# what the journal list screen renders
+LIST_VIEW_FIELDS = ["title", "date", "preview"]
 
-async def retrieve_journal_list(user_ID: str):
-    return await get_user_journals(user_ID)
 
+async def retrieve_journal_list(user_ID: str, fields: Optional[List[str]] = None):
+    """Full journals by default; pass `fields` (e.g. LIST_VIEW_FIELDS) to only load those."""
+    # _id stays an ObjectId: /get_all encodes it in api/fast_json.py, the AI prompt never uses it
+    return await get_user_journals(user_ID, journal_projection(fields), serialize=False)
+
+
+async def retrieve_journal_page(user_ID: str, limit: int, cursor: Optional[str] = None,
+                                date_from: Optional[int] = None, date_to: Optional[int] = None,
+                                fields: Optional[List[str]] = None):
+    return await get_user_journals_page(user_ID, limit, cursor, date_from, date_to, journal_projection(fields))
@@ -1,7 +1,16 @@
 # Description: retrieves a list of quizzes's date info.
 # Created by Emilia on 2026-01-31
-from db.quiz_crud import get_user_quiz_entries
+from typing import List, Optional
 
+from db.quiz_crud import get_user_quiz_entries, get_user_quiz_entries_page, quiz_projection
 
-async def retrieve_quiz_list(user_ID: str):
-     return await get_user_quiz_entries(user_ID)
+
+async def retrieve_quiz_list(user_ID: str, fields: Optional[List[str]] = None):
+     # _id stays an ObjectId: /get_all encodes it in api/fast_json.py, the AI prompt never uses it
+     return await get_user_quiz_entries(user_ID, quiz_projection(fields), serialize=False)
+
+
+async def retrieve_quiz_page(user_ID: str, limit: int, cursor: Optional[str] = None,
+                             date_from: Optional[int] = None, date_to: Optional[int] = None,
+                             fields: Optional[List[str]] = None):
+     return await get_user_quiz_entries_page(user_ID, limit, cursor, date_from, date_to, quiz_projection(fields))
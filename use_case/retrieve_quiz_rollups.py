@@ -0,0 +1,11 @@
+# Description: retrieves a user's per-day / per-week quiz rollups (db/quiz_rollup_crud.py) for dashboards.
+# Created on 2026-10-18
+from typing import Optional
+
+from db.quiz_rollup_crud import get_quiz_rollups
+
+
+async def retrieve_quiz_rollups(user_ID: str, period: str = "week",
+                                date_from: Optional[int] = None, date_to: Optional[int] = None):
+     return {"user_ID": user_ID, "period": period,
+             "rollups": await get_quiz_rollups(user_ID, period, date_from, date_to)}
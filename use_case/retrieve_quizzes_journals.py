@@ -1,10 +1,38 @@
 # Description: retrieve every single journal and quiz in database. combines other functions:
 # first uses retrieve journal and quiz list for id list, then individually retrieves each via id.
 # Created by Emilia on 2026-01-31
+from typing import List, Optional
+
+from db import history_cache, user_versions
+from db.database import causal_reads
+from db.journal_crud import journal_projection, stream_user_journals
+from db.quiz_crud import quiz_projection, stream_user_quiz_entries
 from . import retrieve_journal_list
 from . import retrieve_quiz_list
 
-async def retrieve_all_quizzes_and_journals(user_ID: str):
-    journal_list = await retrieve_journal_list.retrieve_journal_list(user_ID)
-    quiz_list = await retrieve_quiz_list.retrieve_quiz_list(user_ID)
-    return journal_list, quiz_list
+async def retrieve_all_quizzes_and_journals(user_ID: str, fields: Optional[List[str]] = None,
+                                            version: Optional[int] = None):
+    """
+    (journals, quizzes) for the user, served from db/history_cache.py until they write again. Treat as read-only.
+    Pass `version` if the caller already read the user's data version (db/user_versions.py).
+    """
+    async def load():
+        journal_list = await retrieve_journal_list.retrieve_journal_list(user_ID, fields)
+        quiz_list = await retrieve_quiz_list.retrieve_quiz_list(user_ID, fields)
+        return journal_list, quiz_list
+
+    async with causal_reads():
+        if version is None:
+            version = await user_versions.get_version(user_ID)
+        return await history_cache.get_history(user_ID, fields, version, load)
+
+
+def stream_all_quizzes_and_journals(user_ID: str, fields: Optional[List[str]] = None) -> dict:
+    """
+    Lazy version for the response path: {"journals": cursor, "quizzes": cursor} of raw BSON documents,
+    read straight from mongo (no history cache) and never materialized as lists.
+    """
+    return {
+        "journals": stream_user_journals(user_ID, journal_projection(fields)),
+        "quizzes": stream_user_quiz_entries(user_ID, quiz_projection(fields)),
+    }
@@ -1,16 +1,77 @@
 # Description:
 # Created by Emilia on 2026-01-31
+from typing import List
+
 from db import persist_data
 from entities.journal import JournalEntry
-from use_case.ai_retrieve_keywords_journal_entry import prompt_ai
+from use_case.job_workers import enqueue_journals_analysis
 
+MAX_BATCH_SIZE = 1000
 
-async def save_journal(data: dict):
-    date = data["date"]
+
+def convert_journal(data: dict) -> JournalEntry:
+    """
+    Converts raw request dict into JournalEntry domain entity.
+    Raises KeyError / ValueError / TypeError if a required field is missing or malformed.
+    """
+    date = int(data["date"])
     title = data["title"]
     user_id = data["user_ID"]
     text = data["content"]
+    if not isinstance(user_id, str) or not isinstance(text, str):
+        raise TypeError("user_ID and content must be strings")
     id = ""
-    #prompt_ai(JournalEntry(id, title, user_id, date, text))
-    return await persist_data.save_journal(JournalEntry(id, title, user_id, date, text))
+    return JournalEntry(id, title, user_id, date, text)
+
+
+async def _enqueue_analysis(journals: List[dict]):
+    """
+    Queue keyword extraction + star linking for saved journals (run by the background job workers).
+    The journals are already stored, so a failure here is logged rather than raised: failing the
+    request would make the client retry and save them twice.
+    """
+    try:
+        await enqueue_journals_analysis(journals)
+    except Exception as e:
+        print(f"Error queueing analysis for journals {[j['_id'] for j in journals]}: {e}")
+
+
+async def save_journal(data: dict):
+    journal = await persist_data.save_journal(convert_journal(data))
+    await _enqueue_analysis([journal])
+    return journal
+
+
+async def save_journals(data_list: List[dict]) -> List[dict]:
+    """
+    Validate and save a batch of journal entries (e.g. an offline queue being synced).
+
+    Valid entries are written with one unordered insert; invalid or rejected ones don't stop the rest.
+
+    Returns:
+        One result per input entry, in order:
+        {"index": i, "status": "success", "_id": "..."} or {"index": i, "status": "error", "error": "..."}
+    """
+    if len(data_list) > MAX_BATCH_SIZE:
+        raise ValueError(f"batch too large: {len(data_list)} entries (max {MAX_BATCH_SIZE})")
+
+    results = [None] * len(data_list)
+    valid_indexes, entries = [], []
+    for i, data in enumerate(data_list):
+        try:
+            entries.append(convert_journal(data))
+            valid_indexes.append(i)
+        except (KeyError, ValueError, TypeError) as e:
+            results[i] = {"index": i, "status": "error", "error": f"invalid entry: {e!r}"}
+
+    saved = []
+    for i, outcome in zip(valid_indexes, await persist_data.save_journals(entries)):
+        if outcome["status"] == "success":
+            saved.append(outcome["doc"])
+            results[i] = {"index": i, "status": "success", "_id": outcome["doc"]["_id"]}
+        else:
+            results[i] = {"index": i, "status": "error", "error": outcome["error"]}
 
+    # every item above is already stored: a queueing failure must not turn the batch into a 500
+    await _enqueue_analysis(saved)
+    return results
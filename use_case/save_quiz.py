@@ -1,18 +1,61 @@
 # Description:
 # Created by Emilia on 2026-01-31
+from typing import List
+
 from entities.quiz import QuizEntry
 from db import persist_data
 
-async def save_quiz(data: dict):
+MAX_BATCH_SIZE = 1000
+
+
+def convert_quiz(data: dict) -> QuizEntry:
+    """
+    Converts raw request dict into QuizEntry domain entity.
+    Raises KeyError / ValueError / TypeError if a required field is missing or malformed.
+    """
     id = ""
-    date = data["date"]
+    date = int(data["date"])
     user_id = data["user_ID"]
     quiz_values = data["quiz"]
     yesterday_goal = bool(data["yesterday_goal"])
     tomorrow = data["tomorrow"]
+    if not isinstance(quiz_values, dict):
+        raise TypeError("quiz must be an object of question_code: number")
+    for name, value in quiz_values.items():
+        # bool is an int subclass, but true / false isn't a rating
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise TypeError(f"quiz value for {name!r} must be a number, got {value!r}")
+
+    return QuizEntry(id, user_id, date, quiz_values, yesterday_goal, tomorrow)
+
+
+async def save_quiz(data: dict):
+    await persist_data.save_quiz(convert_quiz(data))
 
-    await persist_data.save_quiz(QuizEntry(id, user_id, date, quiz_values, yesterday_goal, tomorrow))
 
+async def save_quizzes(data_list: List[dict]) -> List[dict]:
+    """
+    Validate and save a batch of quiz check-ins with one unordered insert.
 
+    Returns:
+        One result per input entry, in order:
+        {"index": i, "status": "success", "_id": "..."} or {"index": i, "status": "error", "error": "..."}
+    """
+    if len(data_list) > MAX_BATCH_SIZE:
+        raise ValueError(f"batch too large: {len(data_list)} entries (max {MAX_BATCH_SIZE})")
 
+    results = [None] * len(data_list)
+    valid_indexes, entries = [], []
+    for i, data in enumerate(data_list):
+        try:
+            entries.append(convert_quiz(data))
+            valid_indexes.append(i)
+        except (KeyError, ValueError, TypeError) as e:
+            results[i] = {"index": i, "status": "error", "error": f"invalid entry: {e!r}"}
 
+    for i, outcome in zip(valid_indexes, await persist_data.save_quizzes(entries)):
+        if outcome["status"] == "success":
+            results[i] = {"index": i, "status": "success", "_id": outcome["doc"]["_id"]}
+        else:
+            results[i] = {"index": i, "status": "error", "error": outcome["error"]}
+    return results
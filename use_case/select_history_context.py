@@ -0,0 +1,124 @@
+# Description: picks which past journals / quizzes fit into the AI prompt under a token budget.
+# ranks every entry by recency and relevance to the current message, then greedily fills the budget.
+# Created on 2026-10-18
+import math
+import os
+import re
+import time
+from typing import Dict, List, Tuple
+
+from dotenv import load_dotenv
+
+from use_case.encode_history import estimate_row
+
+load_dotenv()
+
+# rough prompt budget for history, in tokens (override per request with AiInfo.token_budget)
+DEFAULT_TOKEN_BUDGET = int(os.getenv("AI_HISTORY_TOKEN_BUDGET", "6000"))
+# an entry this many days old gets half the recency score of one written today
+RECENCY_HALF_LIFE_DAYS = float(os.getenv("AI_HISTORY_HALF_LIFE_DAYS", "14"))
+# how much relevance counts vs recency when ranking (0 = recency only, 1 = relevance only)
+RELEVANCE_WEIGHT = float(os.getenv("AI_HISTORY_RELEVANCE_WEIGHT", "0.5"))
+
+# gemini averages ~4 characters per token for english text
+CHARS_PER_TOKEN = 4
+
+_WORD_RE = re.compile(r"[a-z0-9']+")
+_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "but", "by", "for", "from", "i", "i'm", "if", "in",
+    "is", "it", "me", "my", "of", "on", "or", "so", "that", "the", "this", "to", "was", "with", "you",
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate for a piece of prompt text."""
+    return max(1, math.ceil(len(text) / CHARS_PER_TOKEN))
+
+
+def _terms(text: str) -> set:
+    return {w for w in _WORD_RE.findall(text.lower()) if w not in _STOPWORDS and len(w) > 2}
+
+
+def _entry_text(entry: dict) -> str:
+    """Searchable text for an entry: title + content for journals, metric names + plan for quizzes."""
+    if "quiz" in entry:
+        return " ".join(list(entry.get("quiz", {}).keys()) + [str(entry.get("tomorrow", ""))])
+    return f"{entry.get('title') or ''} {entry.get('content', '')}"
+
+
+def _entry_date(entry: dict) -> int:
+    try:
+        return int(entry.get("date", 0))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _recency_score(entry_date: int, now: float) -> float:
+    age_days = max(0.0, (now - entry_date) / 86400)
+    return 0.5 ** (age_days / RECENCY_HALF_LIFE_DAYS)
+
+
+def _relevance_score(message_terms: set, entry: dict) -> float:
+    if not message_terms:
+        return 0.0
+    return len(message_terms & _terms(_entry_text(entry))) / len(message_terms)
+
+
+def select_history(
+    message: str,
+    journals: List[dict],
+    quizzes: List[dict],
+    token_budget: int = DEFAULT_TOKEN_BUDGET,
+) -> Tuple[List[dict], List[dict], Dict[str, int]]:
+    """
+    Choose the journals and quizzes to show the model for this message.
+
+    Every entry gets score = (1 - w) * recency + w * relevance, where recency decays
+    exponentially with age and relevance is the share of message words found in the entry.
+    Entries are taken best-first while they fit in the budget; anything too big is skipped
+    so smaller entries further down can still use the space.
+
+    Args:
+        message: What the user just asked
+        journals: Candidate journal documents (raw, unix `date`)
+        quizzes: Candidate quiz documents (raw, unix `date`)
+        token_budget: Max estimated tokens for all included entries
+
+    Returns:
+        (selected_journals, selected_quizzes, stats) - selections keep newest-first order,
+        stats has included / dropped counts per kind and the tokens used.
+    """
+    now = time.time()
+    message_terms = _terms(message)
+
+    candidates = []
+    for kind, entries in (("journals", journals), ("quizzes", quizzes)):
+        for entry in entries:
+            date = _entry_date(entry)
+            score = ((1 - RELEVANCE_WEIGHT) * _recency_score(date, now)
+                     + RELEVANCE_WEIGHT * _relevance_score(message_terms, entry))
+            candidates.append((score, date, kind, entry))
+
+    candidates.sort(key=lambda c: (c[0], c[1]), reverse=True)
+
+    selected = {"journals": [], "quizzes": []}
+    used = 0
+    for score, date, kind, entry in candidates:
+        cost = estimate_tokens(estimate_row(entry))
+        if used + cost > token_budget:
+            continue
+        used += cost
+        selected[kind].append((date, entry))
+
+    selected_journals = [e for _, e in sorted(selected["journals"], key=lambda x: x[0], reverse=True)]
+    selected_quizzes = [e for _, e in sorted(selected["quizzes"], key=lambda x: x[0], reverse=True)]
+
+    stats = {
+        "journals_included": len(selected_journals),
+        "journals_dropped": len(journals) - len(selected_journals),
+        "quizzes_included": len(selected_quizzes),
+        "quizzes_dropped": len(quizzes) - len(selected_quizzes),
+        "tokens_used": used,
+        "token_budget": token_budget,
+    }
+    return selected_journals, selected_quizzes, stats